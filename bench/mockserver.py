@@ -0,0 +1,359 @@
+"""
+Local stand-in for Osiris and its sign-in chain, serving synthetic data.
+
+Serves every endpoint sisAPI uses on one host, with the paths of the real ones, so the
+client can be pointed at it with OSIRIS_BASE_URL. Any s-number and password sign in,
+except the password 'wrong'. The token MockOsiris.TOKEN is always accepted.
+
+Usage:
+    python bench/mockserver.py [--port 8000] [--latency 0.05] [--grades 200] ...
+    OSIRIS_BASE_URL=http://127.0.0.1:8000 python src/sis.py --no-cache grades
+"""
+import re
+import json
+import time
+import uuid
+import hashlib
+import random
+import argparse
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+API_PATH = '/student/osiris/student/'
+AUTHORIZE_PATH = '/oauth2/authorize'
+IDP_LOGIN_PATH = '/simplesaml/module.php/core/loginuserpass.php'
+SP_ASSERTION_PATH = '/authentication/sp/consume-assertion'
+
+LECTURE_TYPES = ['LEC', 'TUT', 'LAB', 'PRE', 'EXA']
+DAYS = ['MA', 'DI', 'WO', 'DO', 'VR']
+
+def _form(action, fields):
+    inputs = ''.join('<input type="hidden" name="{}" value="{}"/>'.format(name, value) for name, value in fields.items())
+    return '<html><body><form method="post" action="{}">{}</form></body></html>'.format(action, inputs)
+
+class MockOsiris:
+    """
+    Synthetic Osiris server, running in a background thread
+
+        with MockOsiris(latency=0.01, grades=5000) as mock:
+            api = sisAPI(base_url=mock.url)
+    """
+
+    TOKEN = 'mock-token'
+
+    def __init__(self, host:str = '127.0.0.1', port:int = 0, latency:float = 0, jitter:float = 0, grades:int = 200, weeks:int = 52, lectures:int = 3, courses:int = 500, registrations:int = 20, padding:int = 0, etags:bool = True):
+        """
+        Args:
+            host: (optional) str, address to listen on
+            port: (optional) int, port to listen on, 0 for any free port
+            latency: (optional) float, seconds added to every response
+            jitter: (optional) float, up to this many seconds are added to the latency at random
+            grades: (optional) int, number of results of the student
+            weeks: (optional) int, number of weeks in the schedule
+            lectures: (optional) int, number of lectures per working day
+            courses: (optional) int, number of courses in the catalog
+            registrations: (optional) int, number of course and of exam registrations
+            padding: (optional) int, number of extra characters in every record, to make payloads larger
+            etags: (optional) bool, send ETags and answer conditional requests with 304 Not Modified
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.grades = grades
+        self.weeks = weeks
+        self.lectures = lectures
+        self.courses = courses
+        self.registrations = registrations
+        self.padding = padding
+        self.etags = etags
+        self.tokens = {self.TOKEN}
+        self.sessions = set()
+        # SAML assertions issued and not yet consumed, so a failed sign in can not be carried on
+        self.assertions = set()
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.mock = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _pad(self, record):
+        if self.padding > 0:
+            record['opmerking'] = 'x' * self.padding
+        return record
+
+    def course(self, i:int, year:int = None):
+        """
+        Returns course i of the catalog, as returned by cursussen_voor_cursusinschrijving
+        """
+        year = 2024 if year is None else year
+        return self._pad({
+            'id_cursus_blok': 100000 + i, 'id_cursus': 50000 + i, 'collegejaar': year, 'blok': 'KW' + str(i % 4 + 1),
+            'cursus': 'NWI-BM{:03d}'.format(i), 'cursus_korte_naam': 'Mock course ' + str(i), 'punten': 6 if i % 2 == 0 else 3,
+            'categorie_omschrijving': 'Regular', 'faculteit_naam': 'Faculty of Science', 'docenten': [{'docent': 'Teacher ' + str(i % 7)}],
+            'voertalen': [{'voertaal_omschrijving': 'English'}], 'inschrijfperiodes': [{'datum_vanaf': '2024-06-01', 'datum_tm': '2024-09-01'}] if i % 3 else [],
+            'werkvormen': [], 'toetsen': [], 'blokken': [], 'kosten': [], 'groepen': [],
+            'werkvorm_voorzieningen': [{'werkvorm': 'HC', 'werkvorm_omschrijving': 'Lecture'}, {'werkvorm': 'WC', 'werkvorm_omschrijving': 'Tutorial'}],
+            'toets_voorzieningen': [{'toets': 'T1', 'toets_omschrijving': 'Written exam'}],
+        })
+
+    def tests(self, i:int):
+        """
+        Returns the tests of course i, as returned by cursussen_voor_toetsinschrijving
+        """
+        course = self.course(i)
+        toetsen = [self._pad({'id_toets_gelegenheid': 700000 + i * 10 + chance, 'toets': 'T1', 'toets_omschrijving': 'Written exam', 'gelegenheid': chance, 'toetsdatum': '2025-0{}-15'.format(chance), 'dag': 'MA'}) for chance in (1, 2)]
+        return {'collegejaar': course['collegejaar'], 'cursus': course['cursus'], 'cursus_korte_naam': course['cursus_korte_naam'], 'toetsen': toetsen}
+
+    def grade(self, i:int):
+        # newest first, like Osiris
+        return self._pad({'cursus': 'NWI-BM{:03d}'.format(i % 1000), 'cursus_korte_naam': 'Mock course ' + str(i % 1000), 'collegejaar': 2024 - i // 40, 'blok': 'KW' + str(4 - i % 40 // 10),
+                          'toets': 'T1', 'gelegenheid': 1, 'weging': 100, 'resultaat': str(5 + i % 5) + ',5', 'voldoende': 'J' if i % 5 else 'N', 'punten': 6, 'toetsdatum': '2024-01-15'})
+
+    def course_registration(self, i:int):
+        course = self.course(i)
+        return self._pad({key: course[key] for key in ('id_cursus_blok', 'id_cursus', 'collegejaar', 'blok', 'cursus', 'cursus_korte_naam', 'punten')})
+
+    def exam_registration(self, i:int):
+        course = self.course(i)
+        test = self.tests(i)['toetsen'][0]
+        return dict(test, collegejaar=course['collegejaar'], blok=course['blok'], id_cursus=course['id_cursus'], cursus=course['cursus'], cursus_korte_naam=course['cursus_korte_naam'])
+
+    def schedule(self, n_weeks:int):
+        monday = date.today() - timedelta(days=date.today().weekday())
+        weeks = []
+        for week in range(min(n_weeks, self.weeks)):
+            start = monday + timedelta(weeks=week)
+            days = []
+            for day in range(7):
+                lectures = []
+                if day < 5:
+                    for lecture in range(self.lectures):
+                        kind = LECTURE_TYPES[(week + day + lecture) % len(LECTURE_TYPES)]
+                        lectures.append(self._pad({'onderwerp': 'NWI-BM{:03d} Mock lecture {}'.format(lecture, lecture), 'soort_rooster': kind, 'tijd_vanaf': '{:02d}:30'.format(8 + 2 * lecture), 'tijd_tm': '{:02d}:15'.format(10 + 2 * lecture), 'locatie': 'HG00.{:03d}'.format(300 + lecture)}))
+                days.append({'datum': str(start + timedelta(days=day)), 'rooster': lectures})
+            weeks.append({'week': start.isocalendar()[1], 'dagen': days})
+        return weeks
+
+    def search(self, body):
+        """
+        Answers a course search with the first hits of the catalog whose code or name starts with the query
+        """
+        query = None
+        year = None
+        for clause in body.get('query', {}).get('bool', {}).get('filter', []):
+            year = clause.get('terms', {}).get('collegejaar', [year])[0]
+        for clause in body.get('query', {}).get('bool', {}).get('should', []):
+            query = list(clause['match_phrase_prefix'].values())[0].lower()
+        hits = []
+        for i in range(self.courses):
+            course = self.course(i, year)
+            if query is None or course['cursus'].lower().startswith(query) or course['cursus_korte_naam'].lower().startswith(query):
+                hits.append(course)
+        start = body.get('from', 0)
+        return {'hits': {'total': len(hits), 'hits': [{'_source': hit} for hit in hits[start:start + body.get('size', 25)]]}, 'aggregations': {}}
+
+def _page(count, make, query):
+    """
+    Returns the page of count items selected by the limit and offset parameters of query, making only those
+
+    Args:
+        count: int, total number of items
+        make: callable returning item i
+        query: dict of query parameters
+    """
+    offset = int(query.get('offset', ['0'])[0])
+    limit = int(query.get('limit', [str(count)])[0])
+    return {'items': [make(i) for i in range(offset, min(count, offset + limit))], 'count': count}
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep connections alive, like the real server
+    protocol_version = 'HTTP/1.1'
+    # send headers and body in one segment, or delayed ACKs stall every response on a kept-alive connection
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status:int, body = '', content_type:str = 'application/json', headers:dict = None):
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        data = body.encode()
+        if self.server.mock.etags and self.command == 'GET' and status == 200 and self.path.startswith(API_PATH):
+            etag = '"' + hashlib.sha1(data).hexdigest()[:16] + '"'
+            headers = dict(headers or {}, ETag=etag)
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _redirect(self, location:str, headers:dict = None):
+        self._respond(302, '', 'text/html', dict(headers or {}, Location=location))
+
+    def _cookies(self):
+        cookies = {}
+        for part in self.headers.get('Cookie', '').split(';'):
+            if '=' in part:
+                name, value = part.strip().split('=', 1)
+                cookies[name] = value
+        return cookies
+
+    def _issue_token(self):
+        mock = self.server.mock
+        token = uuid.uuid4().hex
+        with mock.lock:
+            mock.tokens.add(token)
+        return 'http://' + self.headers['Host'] + '/#access_token=' + token + '&token_type=Bearer&expires_in=3600'
+
+    def _assertion(self, kind:str):
+        mock = self.server.mock
+        assertion = kind + '-' + uuid.uuid4().hex
+        with mock.lock:
+            mock.assertions.add(assertion)
+        return assertion
+
+    def _consume(self, assertion:str):
+        """
+        Returns whether assertion was issued and not consumed before
+        """
+        mock = self.server.mock
+        with mock.lock:
+            if assertion in mock.assertions:
+                mock.assertions.remove(assertion)
+                return True
+        return False
+
+    def _handle(self, method:str):
+        mock = self.server.mock
+        with mock.lock:
+            mock.requests += 1
+        if mock.latency > 0 or mock.jitter > 0:
+            time.sleep(mock.latency + random.uniform(0, mock.jitter))
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length > 0 else ''
+
+        if url.path == '/':
+            # where the token is handed out, in the fragment
+            return self._respond(200, 'signed in', 'text/html')
+        if url.path == AUTHORIZE_PATH and method == 'GET':
+            if self._cookies().get('mock_sso') in mock.sessions:
+                return self._redirect(self._issue_token())
+            return self._redirect(IDP_LOGIN_PATH + '?AuthState=' + uuid.uuid4().hex)
+        if url.path == IDP_LOGIN_PATH and method == 'GET':
+            return self._respond(200, '<html><form method="post"><input name="username"/><input name="password"/></form></html>', 'text/html')
+        if url.path == IDP_LOGIN_PATH and method == 'POST':
+            if query.get('password', [''])[0] in ('', 'wrong') or 'AuthState' not in query:
+                return self._respond(200, '<html>Incorrect username or password</html>', 'text/html')
+            session = uuid.uuid4().hex
+            with mock.lock:
+                mock.sessions.add(session)
+            cookies = {'Set-Cookie': 'mock_sso=' + session + '; Path=/'}
+            return self._respond(200, _form(SP_ASSERTION_PATH, {'SAMLResponse': self._assertion('idp')}), 'text/html', cookies)
+        if url.path == SP_ASSERTION_PATH and method == 'POST':
+            if not self._consume(parse_qs(body).get('SAMLResponse', [''])[0]):
+                return self._respond(403, '<html>Invalid SAML assertion</html>', 'text/html')
+            return self._respond(200, _form(AUTHORIZE_PATH, {'SAMLResponse': self._assertion('sp'), 'RelayState': 'mock'}), 'text/html')
+        if url.path == AUTHORIZE_PATH and method == 'POST':
+            if not self._consume(parse_qs(body).get('SAMLResponse', [''])[0]):
+                return self._respond(400, {'error': 'invalid_request'})
+            return self._redirect(self._issue_token())
+
+        if not url.path.startswith(API_PATH):
+            return self._respond(404, {'error': 'not found'})
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer ') or authorization[len('Bearer '):] not in mock.tokens:
+            return self._respond(401, {'error': 'invalid_token'})
+
+        suff = url.path[len(API_PATH):]
+        if method == 'GET' and suff == 'resultaten':
+            return self._respond(200, _page(mock.grades, mock.grade, query))
+        if method == 'GET' and suff == 'rooster/per_week':
+            return self._respond(200, {'items': mock.schedule(int(query.get('limit', ['1'])[0]))})
+        if method == 'GET' and suff == 'inschrijvingen/cursussen':
+            return self._respond(200, _page(mock.registrations, mock.course_registration, query))
+        if method == 'GET' and suff in ('inschrijvingen/wachtlijsten_cursus', 'inschrijvingen/voorinschrijvingen_cursus'):
+            return self._respond(200, _page(0, None, query))
+        if method == 'GET' and suff == 'inschrijvingen/toetsen':
+            return self._respond(200, _page(mock.registrations, mock.exam_registration, query))
+        if method == 'POST' and suff == 'cursussen_voor_cursusinschrijving/zoeken':
+            return self._respond(200, mock.search(json.loads(body or '{}')))
+
+        match = re.fullmatch(r'cursussen_voor_cursusinschrijving/(\d+)', suff)
+        if method == 'GET' and match and 0 <= int(match.group(1)) - 100000 < mock.courses:
+            return self._respond(200, mock.course(int(match.group(1)) - 100000))
+        match = re.fullmatch(r'cursussen_voor_toetsinschrijving/(\d+)', suff)
+        if method == 'GET' and match and 0 <= int(match.group(1)) - 50000 < mock.courses:
+            return self._respond(200, mock.tests(int(match.group(1)) - 50000))
+        if (method == 'PUT' and re.fullmatch(r'inschrijvingen/cursussen/\d+', suff)) or (method == 'POST' and suff == 'inschrijvingen/toetsen/'):
+            return self._respond(200, {'statusmeldingen': []})
+        return self._respond(404, {'error': 'not found'})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve synthetic Osiris data locally.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0, help='up to this many seconds are added to the latency at random')
+    parser.add_argument('--grades', type=int, default=200)
+    parser.add_argument('--weeks', type=int, default=52)
+    parser.add_argument('--lectures', type=int, default=3, help='lectures per working day')
+    parser.add_argument('--courses', type=int, default=500)
+    parser.add_argument('--registrations', type=int, default=20)
+    parser.add_argument('--padding', type=int, default=0, help='extra characters per record')
+    parser.add_argument('--no-etags', dest='etags', action='store_false', help='do not answer conditional requests')
+    options = parser.parse_args()
+
+    mock = MockOsiris(options.host, options.port, options.latency, options.jitter, options.grades, options.weeks, options.lectures, options.courses, options.registrations, options.padding, options.etags)
+    print('Serving on ' + mock.url + ', token ' + MockOsiris.TOKEN)
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+
+if __name__ == '__main__':
+    main()
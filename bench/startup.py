@@ -0,0 +1,89 @@
+"""
+Startup benchmark for the command line client.
+
+Measures the wall clock time of `sis --help` and of a command served from the cache,
+and reports the slowest imports of each. Exits with status 1 if a target is missed.
+
+Usage:
+    python bench/startup.py [--runs N] [--output results.jsonl]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+SIS = os.path.join(SRC, 'sis.py')
+
+# median wall clock time in seconds
+TARGETS = {
+    'help': 0.15,
+    'cached schedule': 0.30,
+}
+
+SCENARIOS = {
+    'help': ['--help'],
+    'cached schedule': ['schedule', '--stale'],
+}
+
+SCHEDULE = [{'week': 1, 'dagen': [{'rooster': [{'onderwerp': 'NWI-BENCH Benchmarking', 'soort_rooster': 'LEC', 'tijd_vanaf': '08:30', 'tijd_tm': '10:15', 'locatie': 'HG00.304'}]}] + [{'rooster': []}] * 6}]
+
+def prepare_home(home):
+    sys.path.insert(0, SRC)
+    from siscache import ResponseCache
+    ResponseCache(directory=os.path.join(home, '.osiris_cache')).put('rooster/per_week?limit=1', {'items': SCHEDULE})
+    with open(os.path.join(home, '.osiris_token'), 'w') as token_file:
+        token_file.write('benchmark')
+
+def run(args, env, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SIS] + args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def slowest_imports(args, env, n=5):
+    ret = subprocess.run([sys.executable, '-X', 'importtime', SIS] + args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in ret.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # only top level imports
+        if not name.startswith('  '):
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:n]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--output', help='append the results as a JSON line to this file')
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        prepare_home(home)
+        env = dict(os.environ, HOME=home, PAGER='cat')
+
+        results = {}
+        missed = False
+        for name, args in SCENARIOS.items():
+            results[name] = run(args, env, options.runs)
+            status = 'ok' if results[name] <= TARGETS[name] else 'MISSED'
+            missed = missed or status == 'MISSED'
+            print('{:<20} {:7.1f} ms  (target {:.0f} ms)  {}'.format(name, results[name] * 1000, TARGETS[name] * 1000, status))
+            for cumulative, module in slowest_imports(args, env):
+                print('    {:<30} {:7.1f} ms'.format(module, cumulative / 1000))
+
+    if options.output is not None:
+        with open(options.output, 'a') as f:
+            f.write(json.dumps({'time': time.time(), 'python': sys.version.split()[0], 'results': results}) + '\n')
+
+    sys.exit(1 if missed else 0)
+
+if __name__ == '__main__':
+    main()
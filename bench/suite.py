@@ -0,0 +1,180 @@
+"""
+Offline benchmark suite, run against the local stand-in server in bench/mockserver.py.
+
+Measures end-to-end command latency, the throughput of bulk operations, the memory used
+for large grade and schedule histories, and startup time. Exits with status 1 if a
+target is missed, so it can guard releases.
+
+Usage:
+    python bench/suite.py [--runs N] [--latency SECONDS] [--output results.jsonl] [--only commands,bulk,memory,startup]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCH, '..', 'src')
+SIS = os.path.join(SRC, 'sis.py')
+sys.path.insert(0, SRC)
+
+from mockserver import MockOsiris
+import startup
+
+# median seconds per command, with the default latency of the stand-in
+COMMAND_TARGETS = {
+    'grades': 0.6,
+    'schedule': 0.6,
+    'courses': 0.6,
+    'exams': 0.6,
+    'search': 0.6,
+    'sign-in': 0.8,
+}
+
+COMMANDS = {
+    'grades': ['--no-cache', 'grades'],
+    'schedule': ['--no-cache', 'schedule', '-w', '4'],
+    'courses': ['--no-cache', 'courses'],
+    'exams': ['--no-cache', 'exams'],
+    'search': ['--no-cache', 'search', 'NWI-BM01'],
+    'sign-in': ['sign-in'],
+}
+
+# minimum requests per second of the bulk operations, with the default latency of the stand-in;
+# pages are fetched one after another, so grade pages can not exceed 1 / latency
+BULK_TARGETS = {
+    'course infos': 200,
+    'grade pages': 35,
+}
+
+# maximum peak of traced memory in MB
+MEMORY_TARGETS = {
+    'grades 20000': 150,
+    'schedule 260 weeks': 100,
+}
+
+def measure_commands(mock, runs):
+    results = {}
+    with tempfile.TemporaryDirectory() as home:
+        with open(os.path.join(home, '.osiris_token'), 'w') as token_file:
+            json.dump({'access_token': MockOsiris.TOKEN, 'issued_at': time.time(), 'expires_in': 3600}, token_file)
+        env = dict(os.environ, HOME=home, PAGER='cat', OSIRIS_BASE_URL=mock.url)
+        for name, args in COMMANDS.items():
+            times = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, SIS] + args, env=env, input='s1234567\nbenchmark\n', text=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                times.append(time.perf_counter() - start)
+            results[name] = statistics.median(times)
+    return results
+
+def _api(mock):
+    import sisAPI
+    # the default transport, adaptive rate limit included
+    api = sisAPI.sisAPI(use_cache=False, base_url=mock.url)
+    api._setToken({'access_token': MockOsiris.TOKEN, 'issued_at': time.time(), 'expires_in': 3600})
+    return api
+
+def measure_bulk(mock):
+    results = {}
+    api = _api(mock)
+
+    ids = [100000 + i for i in range(200)]
+    start = time.perf_counter()
+    api.get_course_infos(ids)
+    results['course infos'] = len(ids) / (time.perf_counter() - start)
+
+    mock.grades = 5000
+    before = mock.requests
+    start = time.perf_counter()
+    for _ in api.iter_grades(page_size=50):
+        pass
+    results['grade pages'] = (mock.requests - before) / (time.perf_counter() - start)
+    return results
+
+def _peak(fn):
+    """
+    Returns the peak traced memory while running fn, in MB
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+def measure_memory(mock):
+    import sisutil
+    api = _api(mock)
+    results = {}
+
+    mock.grades = 20000
+    results['grades 20000'] = _peak(lambda: api.grades(mock.grades))
+
+    mock.weeks = 260
+    results['schedule 260 weeks'] = _peak(lambda: sum(1 for line in sisutil.stream_schedule(api.schedule(mock.weeks))))
+    return results
+
+def measure_startup(runs):
+    results = {}
+    with tempfile.TemporaryDirectory() as home:
+        startup.prepare_home(home)
+        env = dict(os.environ, HOME=home, PAGER='cat')
+        env.pop('OSIRIS_BASE_URL', None)
+        for name, args in startup.SCENARIOS.items():
+            results[name] = startup.run(args, env, runs)
+    return results
+
+def report(title, results, targets, unit, lower_is_better=True):
+    """
+    Prints results against their targets
+
+    Return:
+        whether any target was missed
+    """
+    print(title)
+    missed = False
+    for name, value in results.items():
+        ok = value <= targets[name] if lower_is_better else value >= targets[name]
+        missed = missed or not ok
+        print('    {:<22} {:10.1f} {:<5} (target {}{:.0f} {})  {}'.format(name, value, unit, '<=' if lower_is_better else '>=', targets[name], unit, 'ok' if ok else 'MISSED'))
+    return missed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds the stand-in server adds to every response')
+    parser.add_argument('--only', default='commands,bulk,memory,startup', help='comma separated groups to run')
+    parser.add_argument('--output', help='append the results as a JSON line to this file')
+    options = parser.parse_args()
+    groups = options.only.split(',')
+
+    results = {}
+    missed = False
+    with MockOsiris(latency=options.latency) as mock:
+        if 'commands' in groups:
+            results['commands'] = measure_commands(mock, options.runs)
+            missed |= report('command latency', {name: value * 1000 for name, value in results['commands'].items()}, {name: value * 1000 for name, value in COMMAND_TARGETS.items()}, 'ms')
+        if 'bulk' in groups:
+            results['bulk'] = measure_bulk(mock)
+            missed |= report('bulk throughput', results['bulk'], BULK_TARGETS, 'req/s', lower_is_better=False)
+        if 'memory' in groups:
+            results['memory'] = measure_memory(mock)
+            missed |= report('peak memory', results['memory'], MEMORY_TARGETS, 'MB')
+    if 'startup' in groups:
+        results['startup'] = measure_startup(options.runs)
+        missed |= report('startup', {name: value * 1000 for name, value in results['startup'].items()}, {name: value * 1000 for name, value in startup.TARGETS.items()}, 'ms')
+
+    if options.output is not None:
+        with open(options.output, 'a') as f:
+            f.write(json.dumps({'time': time.time(), 'python': sys.version.split()[0], 'latency': options.latency, 'results': results}) + '\n')
+
+    sys.exit(1 if missed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,128 @@
 import click
-from tabulate import tabulate
-import sisAPI as sis
 import os
+import sys
+import time
+import signal
+import subprocess
+from datetime import datetime, timedelta
+import siserrors
 import sisutil
-
-api = sis.sisAPI()
+import sisdaemon
+import sisformat
+
+class LazyAPI:
+    """
+    Stands in for a sisAPI that is only constructed (and requests only imported) once it is used
+    """
+
+    def __init__(self):
+        object.__setattr__(self, 'instance', None)
+        object.__setattr__(self, 'use_cache', True)
+        object.__setattr__(self, 'refresh_cache', False)
+
+    def _get(self):
+        if self.instance is None:
+            import sisAPI
+            instance = sisAPI.sisAPI(use_cache=self.use_cache)
+            instance.refresh_cache = self.refresh_cache
+            object.__setattr__(self, 'instance', instance)
+        return self.instance
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get(), name, value)
+
+api = LazyAPI()
+
+# fields output by default in the machine readable formats, those of the tables
+GRADE_FIELDS = ['cursus', 'cursus_korte_naam', 'collegejaar', 'blok', 'weging', 'resultaat', 'voldoende']
+SCHEDULE_FIELDS = ['week', 'dag', 'onderwerp', 'soort_rooster', 'tijd_vanaf', 'tijd_tm', 'locatie']
+COURSE_FIELDS = ['collegejaar', 'blok', 'id_cursus', 'cursus', 'cursus_korte_naam', 'punten']
+EXAM_FIELDS = ['collegejaar', 'blok', 'id_cursus', 'cursus', 'cursus_korte_naam', 'id_toets_gelegenheid', 'toets_omschrijving', 'gelegenheid', 'toetsdatum', 'dag']
+SEARCH_FIELDS = ['id_cursus_blok', 'id_cursus', 'collegejaar', 'blok', 'cursus', 'cursus_korte_naam', 'punten', 'registration_open']
+
+def output_options(command):
+    """
+    Adds the --format and --fields options to a command that lists records
+    """
+    command = click.option('--fields', 'fields', default=None, help='Comma separated fields to output, for the machine readable formats.')(command)
+    command = click.option('--format', 'fmt', type=click.Choice(sisformat.FORMATS), default='table', help='Output format; all but table stream plain records.')(command)
+    return command
+
+# how long stored grades and registrations are used before syncing again
+SYNC_INTERVAL = timedelta(minutes=15)
+
+def stored(table):
+    """
+    Returns the records of table from the local store, syncing the table first if it is outdated.
+    Without cache, the records are streamed from the API instead.
+    """
+    if not api.use_cache:
+        return {'results': api.iter_grades, 'course_registrations': api.iter_courses, 'exam_registrations': api.iter_exams}[table]()
+
+    import sisstore
+    store = sisstore.Store()
+    last_synced = store.last_synced(table)
+    if last_synced is None or datetime.now() - last_synced > SYNC_INTERVAL or api.refresh_cache:
+        if isinstance(api, sisdaemon.DaemonProxy):
+            # the daemon syncs over its warm connections, into the same database
+            api.sync_table(table)
+        else:
+            store.sync_table(api, table)
+    return store.records(table)
 
 @click.group()
-def osiris():
-    pass
+@click.option('--no-cache', 'no_cache', is_flag=True, help='Do not read or store cached responses.')
+@click.option('--refresh', 'refresh', is_flag=True, help='Ignore cached responses, but store the fresh ones.')
+@click.option('--profile', 'profile', is_flag=True, help='Print where the time of the command went.')
+@click.option('--metrics', 'metrics', type=click.Path(dir_okay=False), help='Append request, cache and rendering metrics to this JSON-lines file.')
+@click.pass_context
+def osiris(ctx, no_cache, refresh, profile, metrics):
+    global api
+    object.__setattr__(api, 'use_cache', not no_cache)
+    object.__setattr__(api, 'refresh_cache', refresh)
+    if metrics is not None:
+        import sishooks
+        ctx.call_on_close(sishooks.JSONLinesExporter(metrics).install().close)
+    if profile:
+        import sishooks
+        profiler = sishooks.Profiler().install()
+        ctx.call_on_close(lambda: print_profile(profiler))
+    # requests answered by the daemon can not be measured here
+    if ctx.invoked_subcommand != 'daemon' and not no_cache and not refresh and not profile and metrics is None:
+        api = sisdaemon.connect(api)
+
+def print_profile(profiler):
+    connections = None
+    if api.instance is not None:
+        connections = api.instance.connection_stats()
+    click.echo(profiler.report(connections), err=True)
+
+@click.command()
+def daemon():
+    server = sisdaemon.Daemon(api._get())
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    click.echo('Listening on ' + server.path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+@click.command()
+@click.option('--full', 'full', is_flag=True, help='Fetch all records and remove those that no longer exist.')
+def sync(full):
+    import sisstore
+
+    try:
+        counts = sisstore.Store().sync(api, full)
+        for table in counts:
+            click.echo(table + ': ' + str(counts[table]['new']) + ' new, ' + str(counts[table]['changed']) + ' changed, ' + str(counts[table]['removed']) + ' removed')
+    except siserrors.NoTokenError:
+        click.echo('Please sign in again: sis sign_in')
 
 @click.command()
 def sign_in():
@@ -21,57 +135,97 @@ def sign_in():
         click.secho('sign in failed', fg='red')
 
 @click.command()
-def grades():
+@output_options
+def grades(fmt, fields):
     try:
-        grades = api.grades(100)
-
-        #filter relevant cells
-        grades = list(map(lambda row: [row['cursus'], row['cursus_korte_naam'], row['collegejaar'], row['blok'], row['weging'], row['resultaat'], row['voldoende']], grades))
-        grades_col = []
+        grades = stored('results')
+        if fmt != 'table':
+            sisformat.write_records(grades, sisformat.parse_fields(fields, GRADE_FIELDS), fmt)
+            return
+        # rendered row by row, so the first grades show before all are read
+        pass_style = sisutil.style_codes(fg='green')
+        fail_style = sisutil.style_codes(fg='red')
         column_headers = ['cursus', 'cursus_korte_naam', 'collegejaar', 'blok', 'weging', 'resultaat']
-        for row in grades:
-            res_row = row[:-2]
-            colo = 'red'
-            if row[-1] == 'J':
-                colo = 'green'
+        fixed = [14, 11, 7, 6, 9]
+        table = sisutil.StreamingTable([14, sisutil.flexible_width(fixed), 11, 7, 6, 9], column_headers)
+        rows = (([row['cursus'], row['cursus_korte_naam'], row['collegejaar'], row['blok'], row['weging'], row['resultaat']], [None, None, None, None, None, pass_style if row['voldoende'] == 'J' else fail_style]) for row in grades)
+        click.echo_via_pager(table.lines(rows))
+
+    except siserrors.NoTokenError:
+        click.echo('Please sign in again: sis sign_in', err=fmt != 'table')
 
-            res_row.append(click.style(row[-2], fg=colo))
-            grades_col.append(res_row)
-        click.echo_via_pager(tabulate(grades_col, column_headers, tablefmt='fancy_grid'))
 
-    except sis.NoTokenError:
-        click.echo('Please sign in again: sis sign_in');
+def refresh_schedule_in_background(n_weeks):
+    # don't start another refresh while one was started recently
+    marker = os.environ['HOME'] + '/.osiris_schedule_refresh'
+    try:
+        if time.time() - os.path.getmtime(marker) < 60:
+            return
+    except FileNotFoundError:
+        pass
+    open(marker, 'w').close()
+
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), '--refresh', 'schedule', '-w', str(n_weeks), '--revalidate'], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
 
+def revalidate_schedule(n_weeks):
+    marker = os.environ['HOME'] + '/.osiris_schedule_refresh'
+    try:
+        cached = api.cached_schedule(n_weeks)
+        sched = api.schedule(n_weeks)
+        if cached is not None:
+            changes = sisutil.diff_schedule(cached[0], sched)
+            if changes:
+                sisutil.write_notice(os.environ['HOME'] + '/.osiris_schedule_notice', changes)
+    finally:
+        if os.path.exists(marker):
+            os.remove(marker)
 
 @click.command()
 @click.option('--n_weeks', '-w', 'n_weeks', default=1)
-def schedule(n_weeks):
+@click.option('--stale', '-s', 'stale', is_flag=True, help='Show the cached schedule at once and refresh it in the background.')
+@click.option('--revalidate', 'revalidate', is_flag=True, hidden=True)
+@output_options
+def schedule(n_weeks, stale, revalidate, fmt, fields):
     try:
-        cached = sisutil.read_schedule(os.environ['HOME'] + '/.osiris_schedule.txt')
+        if revalidate:
+            revalidate_schedule(n_weeks)
+            return
+
+        if fmt != 'table':
+            cached = api.cached_schedule(n_weeks) if stale and not api.refresh_cache else None
+            if cached is not None and not cached[2]:
+                refresh_schedule_in_background(n_weeks)
+            sched = cached[0] if cached is not None else api.schedule(n_weeks)
+            sisformat.write_records(sisutil.schedule_records(sched), sisformat.parse_fields(fields, SCHEDULE_FIELDS), fmt)
+            return
+
+        notice = sisutil.pop_notice(os.environ['HOME'] + '/.osiris_schedule_notice')
+        if notice:
+            click.secho('Schedule changed since it was last shown:', fg='yellow')
+            click.echo(notice)
+
+        cached = api.cached_schedule(n_weeks) if stale and not api.refresh_cache else None
         if cached is not None:
-            cached_sched = cached[0]
-            retrieved_time = cached[1]
-            click.secho('CACHED SCHEDULE || MAY BE OUTDATED || RETRIEVED ON ' + retrieved_time, fg='red', bg='cyan')
-            click.secho('CACHED SCHEDULE || MAY BE OUTDATED || RETRIEVED ON ' + retrieved_time, fg='red', bg='cyan')
-            click.secho('CACHED SCHEDULE || MAY BE OUTDATED || RETRIEVED ON ' + retrieved_time, fg='red', bg='cyan')
-            sched_styled = sisutil.style_schedule(cached_sched)
-            click.echo(sched_styled)
-            click.secho('CACHED SCHEDULE || MAY BE OUTDATED || RETRIEVED ON ' + retrieved_time, fg='red', bg='cyan')
-            click.secho('CACHED SCHEDULE || MAY BE OUTDATED || RETRIEVED ON ' + retrieved_time, fg='red', bg='cyan')
-            click.secho('CACHED SCHEDULE || MAY BE OUTDATED || RETRIEVED ON ' + retrieved_time, fg='red', bg='cyan')
-        sched = api.schedule(n_weeks)
-        sched_list = []
-        click.echo_via_pager(sisutil.style_schedule(sched))
-        sisutil.write_schedule(os.environ['HOME'] + '/.osiris_schedule.txt', sched)
-    except sis.NoTokenError:
-        click.echo('No token found. Try signing in again.')
+            if not cached[2]:
+                refresh_schedule_in_background(n_weeks)
+            click.echo_via_pager(sisutil.stream_schedule(cached[0]))
+            return
+
+        click.echo_via_pager(sisutil.stream_schedule(api.schedule(n_weeks)))
+    except siserrors.NoTokenError:
+        click.echo('No token found. Try signing in again.', err=fmt != 'table')
     except KeyError as inst:
         click.echo('Unkown lecture type. Please add an issue on github and mention that the lecture type ' + str(inst) + ' is missing.')
 
 @click.command()
-def courses():
+@output_options
+def courses(fmt, fields):
     try:
-        courses = api.registered_courses(100)
+        courses = stored('course_registrations')
+        if fmt != 'table':
+            sisformat.write_records(courses, sisformat.parse_fields(fields, COURSE_FIELDS), fmt)
+            return
+        from tabulate import tabulate
 
         #filter relevant cells
         courses = list(map(lambda row: [row['collegejaar'], row['blok'], row['id_cursus'], row['cursus'], row['cursus_korte_naam'], row['punten']], courses))
@@ -89,13 +243,18 @@ def courses():
 
         click.echo(tabulate(courses_col, column_headers, tablefmt='fancy_grid'))
 
-    except sis.NoTokenError:
-        click.echo('Please sign in again: sis sign_in');
+    except siserrors.NoTokenError:
+        click.echo('Please sign in again: sis sign_in', err=fmt != 'table')
 
 @click.command()
-def exams():
+@output_options
+def exams(fmt, fields):
     try:
-        exams = api.registered_exams(100)
+        exams = stored('exam_registrations')
+        if fmt != 'table':
+            sisformat.write_records(exams, sisformat.parse_fields(fields, EXAM_FIELDS), fmt)
+            return
+        from tabulate import tabulate
 
         #filter relevant cells
         exams = list(map(lambda row: [row['collegejaar'], row['blok'], row['id_cursus'], row['cursus'], row['cursus_korte_naam'], row['id_toets_gelegenheid'], row['toets_omschrijving'], row['gelegenheid'], row['toetsdatum'], row['dag']], exams))
@@ -115,13 +274,49 @@ def exams():
 
         click.echo(tabulate(exams_col, column_headers, tablefmt='fancy_grid'))
 
-    except sis.NoTokenError:
-        click.echo('Please sign in again: sis sign_in');
+    except siserrors.NoTokenError:
+        click.echo('Please sign in again: sis sign_in', err=fmt != 'table');
+
+
+def parse_time(value):
+    """
+    Parses a POSIX timestamp or an ISO date and time (local time unless it has an offset)
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def register_at(prepared, at):
+    """
+    Sends a prepared registration at the given moment in server time and prints a timing report
 
+    Return:
+        the response, or None if no attempt got one
+    """
+    import sissniper
+    from tabulate import tabulate
+
+    sniper = sissniper.Sniper(api)
+    try:
+        offset = sniper.sync_clock()
+    except sissniper.ClockError as inst:
+        click.echo('Can not time the registration: ' + str(inst))
+        return None
+    click.echo('Server clock is ' + '{:+.0f} ± {:.0f}'.format(offset * 1000, sniper.uncertainty * 1000) + ' ms ahead, waiting until ' + str(datetime.fromtimestamp(at)))
+
+    ret, attempts = sniper.fire(prepared, at)
+
+    report = [[idx, '{:+.1f}'.format(attempt['sent'] * 1000), '{:.1f}'.format(attempt['latency'] * 1000), attempt['status']] for idx, attempt in enumerate(attempts)]
+    click.echo(tabulate(report, headers=['attempt', 'sent (ms after target)', 'latency (ms)', 'status']))
+    return ret
 
 @click.command()
 @click.argument('id_cursus')
-def newexam(id_cursus):
+@click.option('--at', 'at', default=None, help='Register at this moment (ISO date and time, or POSIX timestamp) instead of right away.')
+def newexam(id_cursus, at):
+    from tabulate import tabulate
+
     try:
         course_info_tests = api.get_tests_for_course(id_cursus)
 
@@ -146,20 +341,57 @@ def newexam(id_cursus):
         test_idx = int(click.prompt('Which test would you like to register to? test_idx', type=str))
         if test_idx < len(course_info_tests):
             test = course_info_tests['toetsen'][test_idx]
-            if api.register_for_test(test).status_code == 200:
+            if at is None:
+                ret = api.register_for_test(test)
+            else:
+                ret = register_at(api.prepare_test_registration(test), parse_time(at))
+            if ret is not None and ret.status_code == 200:
                 click.echo(click.style('Registration successful!', fg='green'))
                 return
             else:
                 click.echo(click.style('Registration failed.', fg='red'))
         click.echo(click.style('Test not found.', fg='red'))
-    except sis.NoTokenError:
+    except siserrors.NotFoundError:
+        click.echo(click.style('Course not found.', fg='red'))
+    except siserrors.NoTokenError:
         click.echo('Please sign in again: sis sign_in')
 
 @click.command()
 @click.argument('query')
-def search(query):
+@click.option('--year', '-y', 'year', type=int, default=None, help='Academic year, defaults to the current one.')
+@click.option('--size', '-n', 'size', default=25, help='Number of results.')
+@click.option('--from', '-f', 'start', default=0, help='Index of the first result.')
+@click.option('--offline', 'offline', is_flag=True, help='Search the catalog downloaded by catalog sync.')
+@output_options
+def search(query, year, size, start, offline, fmt, fields):
     try:
-        hits = api.search_for_course(query)['hits']
+        if fmt != 'table':
+            fields = sisformat.parse_fields(fields, SEARCH_FIELDS)
+            # only fetch the fields that are output
+            source_fields = [field for field in fields if field != 'registration_open']
+            if 'registration_open' in fields:
+                source_fields.append('inschrijfperiodes')
+        else:
+            import sisquery
+            source_fields = sisquery.SOURCE_FIELDS
+
+        if offline:
+            import siscatalog
+            catalog = siscatalog.Catalog()
+            if not catalog.load():
+                click.echo('No catalog found. Download it first: sis catalog sync', err=fmt != 'table')
+                return
+            hits = catalog.search(query, start + size)
+            hits['hits'] = hits['hits'][start:]
+        else:
+            hits = api.search_for_course(query, year, start, size, source_fields)['hits']
+
+        if fmt != 'table':
+            records = (dict(hit['_source'], registration_open=len(hit['_source'].get('inschrijfperiodes') or []) > 0) for hit in hits['hits'])
+            sisformat.write_records(records, fields, fmt)
+            return
+
+        from tabulate import tabulate
         print(str(hits['total']) + ' hit(s) found')
 
         headers = ['id_cursus_blok', 'id_cursus', 'collegejaar', 'blok', 'cursus', 'cursus_korte_naam', 'punten']
@@ -188,12 +420,80 @@ def search(query):
             results_table.append(result)
 
         click.echo(tabulate(results_table, headers + ['registration open'], tablefmt='fancy_grid'))
-    except sis.NoTokenError:
+    except siserrors.NoTokenError:
+        click.echo('Please sign in again: sis sign_in', err=fmt != 'table')
+
+# marker and colour of each kind of change reported by watch
+CHANGE_STYLES = {'added': ('+', 'green'), 'changed': ('~', 'yellow'), 'removed': ('-', 'red')}
+
+@click.command()
+@click.argument('what', type=click.Choice(['grades', 'schedule', 'exams']))
+@click.option('--limit', '-n', 'limit', default=100, help='Number of records to watch, or of weeks for the schedule.')
+@click.option('--interval', '-i', 'interval', default=60.0, help='Seconds between polls after a change; grows while nothing changes.')
+@click.option('--max-interval', 'max_interval', default=900.0, help='Maximum number of seconds between polls.')
+@click.option('--format', 'fmt', type=click.Choice(['text', 'jsonl']), default='text', help='Output format of the changes.')
+@click.option('--fields', 'fields', default=None, help='Comma separated fields to output.')
+def watch(what, limit, interval, max_interval, fmt, fields):
+    import siswatch
+
+    fields = sisformat.parse_fields(fields, {'grades': GRADE_FIELDS, 'schedule': SCHEDULE_FIELDS, 'exams': EXAM_FIELDS}[what])
+
+    def emit(changes):
+        if fmt == 'jsonl':
+            sisformat.write_records((dict(record, change=change) for change, record in changes), ['change'] + fields, fmt)
+            sys.stdout.flush()
+            return
+        stamp = datetime.now().strftime('%H:%M')
+        for change, record in changes:
+            marker, colour = CHANGE_STYLES[change]
+            # removed records only have their key fields
+            values = [str(record[field]) for field in fields if record.get(field) is not None]
+            click.secho(stamp + ' ' + marker + ' ' + '  '.join(values), fg=colour)
+
+    watcher = siswatch.Watcher(api, what, limit, interval, max_interval)
+    click.echo('Watching ' + what + ', press Ctrl-C to stop', err=True)
+    try:
+        watcher.run(emit)
+    except siserrors.NoTokenError:
+        click.echo('Please sign in again: sis sign_in', err=True)
+    except KeyboardInterrupt:
+        pass
+
+@click.group()
+def catalog():
+    pass
+
+@click.command(name='sync')
+@click.option('--year', '-y', 'year', type=int, default=None, help='Academic year, defaults to the current one.')
+def catalog_sync(year):
+    import siscatalog
+
+    try:
+        n_courses = siscatalog.Catalog().sync(api, year)
+        click.echo(str(n_courses) + ' courses downloaded')
+    except siserrors.NoTokenError:
         click.echo('Please sign in again: sis sign_in')
 
+catalog.add_command(catalog_sync)
+
+def complete_course(ctx, param, incomplete):
+    """
+    Completes id_cursus_blok from the downloaded catalog
+    """
+    from click.shell_completion import CompletionItem
+    import siscatalog
+
+    catalog = siscatalog.Catalog()
+    if not catalog.load():
+        return []
+    return [CompletionItem(str(course['id_cursus_blok']), help=course.get('cursus_korte_naam')) for course in catalog.courses if str(course['id_cursus_blok']).startswith(incomplete)]
+
 @click.command()
-@click.argument('id_cursus_blok')
-def newcourse(id_cursus_blok):
+@click.argument('id_cursus_blok', shell_complete=complete_course)
+@click.option('--at', 'at', default=None, help='Register at this moment (ISO date and time, or POSIX timestamp) instead of right away.')
+def newcourse(id_cursus_blok, at):
+    from tabulate import tabulate
+
     try:
         course_info = api.get_course_info(id_cursus_blok)
 
@@ -217,15 +517,60 @@ def newcourse(id_cursus_blok):
         click.echo(conf_msg)
 
         if click.confirm('Confirm registration?'):
-            ret = api.register_for_course(course_info)
-            if ret.status_code == 200:
+            if at is None:
+                ret = api.register_for_course(course_info)
+            else:
+                ret = register_at(api.prepare_course_registration(course_info), parse_time(at))
+            if ret is not None and ret.status_code == 200:
                 print('Registered successfully!')
             else:
                 print('Registration failed. Please try again.')
         else:
             click.echo('Registration cancelled')
 
-    except sis.NoTokenError:
+    except siserrors.NotFoundError:
+        click.echo(click.style('Course not found.', fg='red'))
+    except siserrors.NoTokenError:
+        click.echo('Please sign in again: sis sign_in')
+
+@click.command()
+@click.option('--batch', '-b', 'plan_file', required=True, type=click.Path(exists=True, dir_okay=False), help='JSON or YAML file listing the courses and exams to register for.')
+@click.option('--concurrency', '-c', 'concurrency', default=4, help='Maximum number of requests in flight.')
+@click.option('--yes', '-y', 'yes', is_flag=True, help='Do not ask for confirmation.')
+def register(plan_file, concurrency, yes):
+    import sisbatch
+    from tabulate import tabulate
+
+    try:
+        items = sisbatch.resolve(api, sisbatch.load_plan(plan_file), concurrency)
+
+        conf_table = []
+        for item in items:
+            info = item.get('info', {})
+            if item['kind'] == 'course':
+                details = info.get('blok')
+            else:
+                details = str(info.get('toets_omschrijving')) + ' ' + str(info.get('toetsdatum'))
+            error = click.style(item['error'], fg='red') if 'error' in item else ''
+            conf_table.append([item['kind'], item['id'], info.get('collegejaar'), info.get('cursus'), info.get('cursus_korte_naam'), details, error])
+        click.echo(tabulate(conf_table, headers=['kind', 'id', 'collegejaar', 'cursus', 'cursus_korte_naam', 'block / test', ''], tablefmt='fancy_grid'))
+
+        if not yes and not click.confirm('Confirm registration?'):
+            click.echo('Registration cancelled')
+            return
+
+        results_table = []
+        for item in sisbatch.submit(api, items, concurrency):
+            if item['status'] == 200:
+                status = click.style('registered', fg='green')
+            else:
+                status = click.style('failed (' + str(item['status']) + ')', fg='red')
+            results_table.append([item['kind'], item['id'], item['info'].get('cursus'), item['info'].get('cursus_korte_naam'), status])
+        click.echo(tabulate(results_table, headers=['kind', 'id', 'cursus', 'cursus_korte_naam', 'status'], tablefmt='fancy_grid'))
+
+    except sisbatch.PlanError as inst:
+        click.echo('Could not read plan: ' + str(inst))
+    except siserrors.NoTokenError:
         click.echo('Please sign in again: sis sign_in')
 
 osiris.add_command(sign_in)
@@ -235,5 +580,10 @@ osiris.add_command(courses)
 osiris.add_command(search)
 osiris.add_command(newcourse)
 osiris.add_command(newexam)
+osiris.add_command(register)
 osiris.add_command(exams)
+osiris.add_command(daemon)
+osiris.add_command(sync)
+osiris.add_command(catalog)
+osiris.add_command(watch)
 osiris()
@@ -1,16 +1,168 @@
 import requests
 import os
 import json
+import time
+import hashlib
+import threading
+from http.cookiejar import LWPCookieJar
+from urllib.parse import parse_qs, urlsplit
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from siserrors import NoTokenError, SignInError, NotFoundError
+from sistransport import Transport
+from siscache import ResponseCache
+from sismemo import Memo
+import sisquery
+import sishooks
+import sisstore
+
+REDIRECT_URI = 'https://ru.osiris-student.nl'
+AUTHORIZE_URL = 'https://auth-app-ruprd-ruprd.xpaas.caci.nl/oauth2/authorize'
+AUTHORIZE_START_URL = AUTHORIZE_URL + '?response_type=token&client_id=osiris-student-mobile-ruprd&redirect_uri=' + REDIRECT_URI
+IDP_LOGIN_URL = 'https://conext.authenticatie.ru.nl/simplesaml/module.php/core/loginuserpass.php?'
+SP_ASSERTION_URL = 'https://engine.surfconext.nl/authentication/sp/consume-assertion'
+API_URL = 'https://ru.osiris-student.nl/student/osiris/student/'
+
+# environment variable that points all requests at another host, such as bench/mockserver.py
+BASE_URL_VARIABLE = 'OSIRIS_BASE_URL'
+
+# renew the token when it expires within this many seconds
+TOKEN_REFRESH_MARGIN = 120
+
+def _rebase(url:str, base_url:str):
+    """
+    Returns url with its scheme and host replaced by base_url
+    """
+    parts = urlsplit(url)
+    return base_url.rstrip('/') + url[len(parts.scheme + '://' + parts.netloc):]
+
+def endpoints(base_url:str = None):
+    """
+    Returns the URLs used to sign in and to reach the API
+
+    Args:
+        base_url: (optional) str, scheme and host to send all requests to instead of the real ones, defaults to $OSIRIS_BASE_URL
 
-class NoTokenError(Exception):
+    Return:
+        dict with the authorize, authorize_start, idp_login, sp_assertion and api URLs
     """
-    Raised when a token is needed but no token is defined
+    if base_url is None:
+        base_url = os.environ.get(BASE_URL_VARIABLE)
+    if base_url is None:
+        return {'authorize': AUTHORIZE_URL, 'authorize_start': AUTHORIZE_START_URL, 'idp_login': IDP_LOGIN_URL, 'sp_assertion': SP_ASSERTION_URL, 'api': API_URL}
+    return {
+        'authorize': _rebase(AUTHORIZE_URL, base_url),
+        'authorize_start': _rebase(AUTHORIZE_START_URL, base_url).replace(REDIRECT_URI, base_url.rstrip('/')),
+        'idp_login': _rebase(IDP_LOGIN_URL, base_url),
+        'sp_assertion': _rebase(SP_ASSERTION_URL, base_url),
+        'api': _rebase(API_URL, base_url),
+    }
+
+def _token_path():
+    return os.environ['HOME'] + '/.osiris_token'
+
+def _cookie_path():
+    return os.environ['HOME'] + '/.osiris_cookies'
+
+def _read_token_file(path:str):
     """
+    Reads a stored token
 
-class SignInError(Exception):
+    Return:
+        dict with access_token, issued_at and expires_in (None if unknown), or None if there is no token
+    """
+    try:
+        with open(path, 'r') as token_file:
+            content = token_file.read().strip()
+    except OSError:
+        return None
+    if content == '':
+        return None
+    try:
+        return json.loads(content)
+    except ValueError:
+        # token stored by an older version, without metadata
+        return {'access_token': content, 'issued_at': None, 'expires_in': None}
+
+def _write_token_file(path:str, token_info):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as token_file:
+        json.dump(token_info, token_file)
+    os.chmod(path, 0o600)
+
+def _form_field(html:str, name:str):
     """
-    Raised when something went wrong during signing in. Presumed to be caused by incorrect credentials
+    Extracts the value of the (hidden) form input called name from an html page
     """
+    value = html[html.find('name="' + name + '"') + len(name) + 15:]
+    return value[:value.find('"')]
+
+def _url_parameter(url:str, name:str):
+    """
+    Extracts the value of parameter name from the query or fragment of url, or None if it is missing
+    """
+    parameters = url[url.find('#') + 1:] if '#' in url else url[url.find('?') + 1:]
+    value = parse_qs(parameters).get(name)
+    return None if value is None else value[0]
+
+def _token_info(url:str):
+    """
+    Extracts the token and its lifetime from the URL the authorization flow redirects to
+    """
+    access_token = _url_parameter(url, 'access_token')
+    if access_token is None:
+        raise SignInError()
+    expires_in = _url_parameter(url, 'expires_in')
+    return {'access_token': access_token, 'issued_at': time.time(), 'expires_in': None if expires_in is None else int(expires_in)}
+
+def _login_payload(username:str, password:str, auth_url:str):
+    auth_state = auth_url[auth_url.find('AuthState=')+10:]
+    return {'username': username, 'password': password, 'submit': 'Login', 'AuthState': requests.compat.unquote(auth_state)}
+
+def _test_payload(test_info):
+    return '{"toetsen": [' + json.dumps(test_info) + ']}'
+
+def _send(phase:str, method:str, url:str, send):
+    """
+    Calls send, which sends one request, emitting the pre_send and response hooks around it
+
+    Return:
+        request response
+    """
+    sishooks.emit('pre_send', phase=phase, method=method, url=url)
+    start = time.perf_counter()
+    ret = send()
+    if sishooks.active('response'):
+        body = ret.request.body
+        sishooks.emit('response', phase=phase, method=method, url=url, status=ret.status_code, seconds=time.perf_counter() - start, server_seconds=ret.elapsed.total_seconds(), sent=0 if body is None else len(body), received=len(ret.content))
+    return ret
+
+def _decode(suff:str, ret):
+    """
+    Decodes the JSON body of ret, emitting the decode hook
+    """
+    start = time.perf_counter()
+    data = ret.json()
+    sishooks.emit('decode', suff=suff, seconds=time.perf_counter() - start)
+    return data
+
+def _course_payload(course_info):
+    # course_info may be shared through the memo, so work on a copy
+    course_info = dict(course_info)
+    course_info['toets_voorzieningen'] = []
+    course_info['toetsen'] = []
+    course_info['werkvorm_groepen'] = []
+    course_info['werkvormen'] = []
+    # maybe something to do with dyselxia?
+    course_info['werkvorm_voorzieningen'] = []
+    course_info['blokken'] = []
+    course_info['kosten'] = []
+    course_info['inschrijfperiodes'] = []
+    course_info['enrollment_type'] = 'regular'
+    course_info['onderdeel_van'] = ''
+    course_info['is_in_enrolment_period'] = False
+    course_info['groepen'] = []
+    return json.dumps(course_info)
 
 class sisAPI:
     """
@@ -26,14 +178,38 @@ class sisAPI:
         Return:
             Previously retrieved authentication, or None if could not find.
         """
-        try:
-            token_file = open(os.environ['HOME'] + '/.osiris_token', 'r')
-            access_token = token_file.read()
-            if access_token is None:
-                return None
-            self.access_token = access_token
-        except:
+        token_info = _read_token_file(_token_path())
+        if token_info is None:
             return None
+        self._setToken(token_info)
+        return token_info['access_token']
+
+    def _storeToken(self):
+        """
+        Store the current token, with its metadata, at ~/.osiris_token
+        """
+        _write_token_file(_token_path(), self.token_info)
+
+    def _saveCookies(self, cookies):
+        """
+        Store the cookies of the sign in flow, so the single sign on session can be reused to renew the token
+        """
+        jar = LWPCookieJar(_cookie_path())
+        for cookie in cookies:
+            jar.set_cookie(cookie)
+        # save() keeps the mode of an existing file, so create it private before writing the session to it
+        fd = os.open(_cookie_path(), os.O_WRONLY | os.O_CREAT, 0o600)
+        os.fchmod(fd, 0o600)
+        os.close(fd)
+        jar.save(ignore_discard=True)
+
+    def _loadCookies(self):
+        jar = LWPCookieJar(_cookie_path())
+        try:
+            jar.load(ignore_discard=True)
+        except OSError:
+            pass
+        return jar
 
     def _assureSuccess(self, ret):
         """
@@ -42,6 +218,67 @@ class sisAPI:
         if ret.status_code != 200:
             raise SignInError()
 
+    def _setToken(self, token_info):
+        """
+        Use the token described by token_info (as returned by _getToken) for all subsequent requests
+        """
+        self.token_info = token_info
+        self.access_token = None if token_info is None else token_info['access_token']
+        self.transport.set_header('Authorization', None if self.access_token is None else 'Bearer ' + self.access_token)
+
+    def _tokenExpiring(self):
+        """
+        Whether the token is known to expire soon
+        """
+        if self.token_info is None or self.token_info.get('issued_at') is None or self.token_info.get('expires_in') is None:
+            return False
+        return time.time() > self.token_info['issued_at'] + self.token_info['expires_in'] - TOKEN_REFRESH_MARGIN
+
+    def _renewToken(self, rejected:str = None):
+        """
+        Obtain a new token without credentials, using the stored single sign on session
+
+        Args:
+            rejected: (optional) str, token the server rejected; if the token has been replaced since, it is not renewed again
+
+        Return:
+            whether a valid token is available afterwards
+        """
+        with self.token_lock:
+            if rejected is not None and self.access_token != rejected:
+                return self.access_token is not None
+            if rejected is None and (not self._tokenExpiring() or self.renewal_failed == self.access_token):
+                return True
+
+            ses = requests.Session()
+            ses.cookies.update(self._loadCookies())
+            try:
+                # the token lock is held, so never wait on the identity provider indefinitely
+                timeout = self.transport.timeout
+                ret = _send('auth', 'GET', self.urls['authorize_start'], lambda: ses.get(self.urls['authorize_start'], timeout=timeout))
+                self._assureSuccess(ret)
+                if _url_parameter(ret.url, 'access_token') is None:
+                    if 'name="SAMLResponse"' not in ret.text:
+                        # the identity provider asks for credentials again
+                        self.renewal_failed = self.access_token
+                        return False
+                    if self.urls['sp_assertion'] in ret.text:
+                        data = {'SAMLResponse': _form_field(ret.text, 'SAMLResponse')}
+                        ret = _send('auth', 'POST', self.urls['sp_assertion'], lambda: ses.post(self.urls['sp_assertion'], data=data, timeout=timeout))
+                        self._assureSuccess(ret)
+                    data = {'SAMLResponse': _form_field(ret.text, 'SAMLResponse'), 'RelayState': _form_field(ret.text, 'RelayState')}
+                    ret = _send('auth', 'POST', self.urls['authorize'], lambda: ses.post(self.urls['authorize'], data=data, timeout=timeout))
+                    self._assureSuccess(ret)
+                self._setToken(_token_info(ret.url))
+            except (SignInError, OSError):
+                self.renewal_failed = self.access_token
+                return False
+
+            self._storeToken()
+            self._saveCookies(ses.cookies)
+            return True
+
+
     def _getToken(self, username:str, password:str):
         """
         Obtain new token using passed credentials
@@ -51,50 +288,38 @@ class sisAPI:
             password: str, corresponding password
 
         Return:
-            Authentication token, or throws an error if something went wrong.
+            dict with the authentication token, the time it was issued and its lifetime in seconds, or throws an error if something went wrong.
         """
         ses = requests.Session()
-        req1 = requests.Request('GET', 'https://auth-app-ruprd-ruprd.xpaas.caci.nl/oauth2/authorize?response_type=token&client_id=osiris-student-mobile-ruprd&redirect_uri=https://ru.osiris-student.nl').prepare()
-        r = ses.send(req1)
+        req1 = requests.Request('GET', self.urls['authorize_start']).prepare()
+        r = _send('auth', 'GET', req1.url, lambda: ses.send(req1))
         self._assureSuccess(r)
-        
-        auth_state_start_idx = r.url.find('AuthState=')+10
 
-        auth_state = r.url[auth_state_start_idx:]
-        
-        language = 'EN'
-        submit = 'Login'
+        payload = _login_payload(username, password, r.url)
 
-        payload = {'username': username, 'password': password, 'submit': submit, 'AuthState': requests.compat.unquote(auth_state)}
-
-        req2 = requests.Request('POST', 'https://conext.authenticatie.ru.nl/simplesaml/module.php/core/loginuserpass.php?', params=payload, cookies=r.cookies).prepare()
-        r2 = ses.send(req2)
+        req2 = requests.Request('POST', self.urls['idp_login'], params=payload, cookies=r.cookies).prepare()
+        r2 = _send('auth', 'POST', self.urls['idp_login'], lambda: ses.send(req2))
         self._assureSuccess(r2)
-        
-        saml_form = r2.text[r2.text.find('name="SAMLResponse"')+27:]
-        saml_form = saml_form[:saml_form.find('"')]
 
-        req = requests.Request('POST', 'https://engine.surfconext.nl/authentication/sp/consume-assertion', data={'SAMLResponse': saml_form}, cookies={'main': ses.cookies.get('main'), 'HTTPSERVERID': ses.cookies.get('HTTPSERVERID')})
+        saml_form = _form_field(r2.text, 'SAMLResponse')
+
+        req = requests.Request('POST', self.urls['sp_assertion'], data={'SAMLResponse': saml_form}, cookies={'main': ses.cookies.get('main'), 'HTTPSERVERID': ses.cookies.get('HTTPSERVERID')})
         r3 = req.prepare()
-        ret = ses.send(r3)
-        
+        ret = _send('auth', 'POST', self.urls['sp_assertion'], lambda: ses.send(r3))
+
         self._assureSuccess(ret)
 
-        saml_form = ret.text[ret.text.find('name="SAMLResponse"')+27:]
-        saml_form = saml_form[:saml_form.find('"')]
-        
-        relay_state = ret.text[ret.text.find('name="RelayState"')+25:]
-        relay_state = relay_state[:relay_state.find('"')]
-        
-        req = requests.Request('POST', 'https://auth-app-ruprd-ruprd.xpaas.caci.nl/oauth2/authorize', data={'SAMLResponse': saml_form, 'RelayState': relay_state}, cookies={}).prepare()
-        ret = ses.send(req)
+        saml_form = _form_field(ret.text, 'SAMLResponse')
+        relay_state = _form_field(ret.text, 'RelayState')
+
+        req = requests.Request('POST', self.urls['authorize'], data={'SAMLResponse': saml_form, 'RelayState': relay_state}, cookies={}).prepare()
+        ret = _send('auth', 'POST', self.urls['authorize'], lambda: ses.send(req))
         self._assureSuccess(ret)
-        
-        access_token = ret.url[ret.url.find('access_token')+13:]
-        access_token = access_token[:access_token.find('&')]
-        return access_token
 
-    def _getData(self, suff : str, method : str = 'GET', payload : str = ""):
+        self._saveCookies(ses.cookies)
+        return _token_info(ret.url)
+
+    def _getData(self, suff : str, method : str = 'GET', payload : str = "", headers : dict = None):
         """
         Helper method for executing GET requests
 
@@ -102,6 +327,7 @@ class sisAPI:
             method: GET, POST or POT, specifies request method
             suff: str, request URL suffix
             payload: (optional) str, request payload
+            headers: (optional) dict, extra request headers
 
         Return:
             request response
@@ -113,14 +339,240 @@ class sisAPI:
 
         if self.access_token is None:
             raise NoTokenError()
-        ses = requests.Session()
-        req = requests.Request(method, 'https://ru.osiris-student.nl/student/osiris/student/' + suff, headers={'Authorization': 'Bearer ' + self.access_token, 'taal': 'EN'}, data=payload).prepare()
-        return ses.send(req)
+        if self._tokenExpiring() and self.renewal_failed != self.access_token:
+            self._renewToken()
+
+        access_token = self.access_token
+        send = lambda: self.transport.request(method, self.urls['api'] + suff, data=payload, headers=headers)
+        ret = _send('request', method, self.urls['api'] + suff, send)
+        if ret.status_code == 401:
+            # the token expired or was revoked: renew it once and try again
+            if not self._renewToken(rejected=access_token):
+                raise NoTokenError()
+            ret = _send('request', method, self.urls['api'] + suff, send)
+        return ret
+
+    def _getJSON(self, suff : str, method : str = 'GET', payload : str = "", checked : bool = False, cached : bool = True):
+        """
+        Helper method for executing requests that only read data, consulting the response cache
+
+        Args:
+            suff: str, request URL suffix
+            method: (optional) GET or POST, specifies request method
+            payload: (optional) str, request payload
+            checked: (optional) bool, raise NotFoundError on 404 and requests.HTTPError on other
+                unsuccessful responses, instead of returning the error body
+            cached: (optional) bool, read and store the response in the response cache
+
+        Return:
+            decoded JSON response
+        """
+        cache = self.cache if cached else None
+        if cache is not None and not self.refresh_cache:
+            entry = cache.get(suff, payload)
+            if entry is not None:
+                return entry[0]
+
+        ret = self._getData(suff, method, payload)
+        if checked:
+            if ret.status_code == 404:
+                raise NotFoundError(suff)
+            ret.raise_for_status()
+        data = _decode(suff, ret)
+        if cache is not None and ret.status_code == 200:
+            cache.put(suff, data, payload)
+        return data
+
+    def poll(self, suff:str, validators:dict = None):
+        """
+        Fetches the items of a list endpoint, unless they did not change since an earlier poll.
+
+        Uses conditional requests when the server returned an ETag or Last-Modified header,
+        and otherwise compares a hash of the response, so unchanged responses are not decoded.
+
+        Args:
+            suff: str, request URL suffix
+            validators: (optional) dict, as returned by the previous poll of suff
+
+        Return:
+            tuple of the items, or None if they did not change, and the validators for the next poll
+        """
+        validators = {} if validators is None else validators
+        headers = {}
+        if validators.get('etag') is not None:
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified') is not None:
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        ret = self._getData(suff, headers=headers)
+        if ret.status_code == 304:
+            return (None, validators)
+        ret.raise_for_status()
+
+        digest = hashlib.sha1(ret.content).hexdigest()
+        new_validators = {'etag': ret.headers.get('ETag'), 'last_modified': ret.headers.get('Last-Modified'), 'digest': digest}
+        if digest == validators.get('digest'):
+            return (None, new_validators)
+        return (_decode(suff, ret)['items'], new_validators)
+
+    def _map_concurrent(self, fn, items, max_workers:int = None):
+        """
+        Apply fn to every item using a bounded thread pool
+
+        Args:
+            fn: callable taking one item
+            items: iterable of items
+            max_workers: (optional) int, maximum number of concurrent calls, defaults to the connection pool size
+
+        Return:
+            list of results, in the same order as items
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        if max_workers is None:
+            max_workers = self.transport.pool_size
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            return list(executor.map(fn, items))
+
+    def iter_pages(self, suff:str, page_size:int = 50, prefetch:bool = True):
+        """
+        Pages through a list endpoint using limit and offset, bypassing the response cache
+
+        Args:
+            suff: str, request URL suffix of the list endpoint
+            page_size: (optional) int, number of items per request
+            prefetch: (optional) bool, request the next page while the current one is being consumed
+
+        Return:
+            generator of lists of items, one per page
+        """
+        separator = '&' if '?' in suff else '?'
+        def fetch(offset):
+            page_suff = suff + separator + 'limit=' + str(page_size) + '&offset=' + str(offset)
+            return _decode(page_suff, self._getData(page_suff))['items']
+
+        if not prefetch:
+            offset = 0
+            while True:
+                page = fetch(offset)
+                yield page
+                if len(page) < page_size:
+                    return
+                offset += page_size
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            offset = 0
+            next_page = executor.submit(fetch, offset)
+            while True:
+                page = next_page.result()
+                if len(page) < page_size:
+                    yield page
+                    return
+                offset += page_size
+                next_page = executor.submit(fetch, offset)
+                yield page
+
+    def _iter_items(self, suffixes, page_size:int):
+        for suff in suffixes:
+            for page in self.iter_pages(suff, page_size):
+                yield from page
+
+    def iter_grades(self, page_size:int = 50):
+        """
+        Iterates over all grades, fetching them page by page
+
+        Args:
+            page_size: (optional) int, number of grades per request
+
+        Return:
+            generator of grades
+        """
+        return self._iter_items(['resultaten'], page_size)
+
+    def iter_courses(self, page_size:int = 50):
+        """
+        Iterates over all courses registered for, including waiting lists and preliminary registrations
+
+        Args:
+            page_size: (optional) int, number of courses per request
+
+        Return:
+            generator of courses
+        """
+        return self._iter_items(['inschrijvingen/cursussen', 'inschrijvingen/wachtlijsten_cursus', 'inschrijvingen/voorinschrijvingen_cursus'], page_size)
+
+    def iter_exams(self, page_size:int = 50):
+        """
+        Iterates over all exams registered for, fetching them page by page
+
+        Args:
+            page_size: (optional) int, number of exams per request
+
+        Return:
+            generator of exams
+        """
+        return self._iter_items(['inschrijvingen/toetsen'], page_size)
+
+    def fetch_all(self, suffixes, max_workers:int = None):
+        """
+        Executes GET requests for several URL suffixes concurrently
+
+        Args:
+            suffixes: list of str, request URL suffixes
+            max_workers: (optional) int, maximum number of requests in flight
+
+        Return:
+            list of decoded JSON responses, in the same order as suffixes
+        """
+        return self._map_concurrent(self._getJSON, suffixes, max_workers)
 
-    def __init__(self):
+    def __init__(self, pool_size:int = 10, connect_timeout:float = 5, read_timeout:float = 30, use_cache:bool = True, cache:ResponseCache = None, memo_ttl:float = 300, transport:Transport = None, base_url:str = None):
+        """
+        Args:
+            pool_size: (optional) int, number of keep-alive connections kept open to the API
+            connect_timeout: (optional) float, seconds to wait for a connection
+            read_timeout: (optional) float, seconds to wait for a response
+            use_cache: (optional) bool, whether to cache responses
+            cache: (optional) ResponseCache, cache to use instead of the default one at ~/.osiris_cache
+            memo_ttl: (optional) float, seconds course and test information is remembered in memory
+            transport: (optional) Transport, transport to use instead of one built from pool_size and the timeouts
+            base_url: (optional) str, scheme and host to send all requests to instead of Osiris, defaults to $OSIRIS_BASE_URL
+        """
+        self.urls = endpoints(base_url)
+        if transport is None:
+            transport = Transport(pool_size, connect_timeout, read_timeout)
+        transport.set_header('taal', 'EN')
+        self.transport = transport
+        self.token_lock = threading.Lock()
+        # token whose proactive renewal failed; it is used until the server rejects it
+        self.renewal_failed = None
+        self.token_info = None
+        if use_cache and cache is None:
+            cache = ResponseCache()
+        self.cache = cache if use_cache else None
+        # when set, cached responses are not read, but fresh ones are still stored
+        self.refresh_cache = False
+        self.memo = Memo(memo_ttl)
         self.access_token = None
         self._readToken()
 
+    def _invalidateRegistrations(self):
+        """
+        Drop cached registrations, after they may have changed
+        """
+        if self.cache is not None:
+            self.cache.invalidate('inschrijvingen/')
+
+    def connection_stats(self):
+        """
+        Returns connection reuse counters of the underlying transport
+
+        Return:
+            dict with the number of requests sent, connections opened and connections reused
+        """
+        return self.transport.stats()
+
     def sign_in(self, username:str, password:str):
         """
         Sign in using credentials and store new token
@@ -137,13 +589,20 @@ class sisAPI:
         assert isinstance(password, str)
 
         try:
-            self.access_token = self._getToken(username, password)
-            token_file = open(os.environ['HOME'] + '/.osiris_token', 'w')
-            token_file.write(self.access_token)
-            return True
+            self._setToken(self._getToken(username, password))
+            self._storeToken()
         except:
             return False
 
+        if self.cache is not None:
+            self.cache.invalidate()
+        # the store would otherwise mix the records of the previous student with those of this one
+        if os.path.exists(sisstore.default_path()):
+            store = sisstore.Store()
+            store.clear()
+            store.close()
+        return True
+
     def grades(self, limit:int):
         """
         Returns list of grades
@@ -156,7 +615,7 @@ class sisAPI:
 
         assert isinstance(limit, int)
 
-        return self._getData('resultaten?limit=' + str(limit)).json()['items']
+        return self._getJSON('resultaten?limit=' + str(limit))['items']
 
     def schedule(self, n_weeks:int):
         """
@@ -171,7 +630,29 @@ class sisAPI:
 
         assert isinstance(n_weeks, int)
 
-        return self._getData('rooster/per_week?limit=' + str(n_weeks)).json()['items']
+        return self._getJSON('rooster/per_week?limit=' + str(n_weeks))['items']
+
+    def cached_schedule(self, n_weeks:int):
+        """
+        Returns the cached schedule, however old it is, without contacting the server
+
+        Args:
+            n_weeks: int, number of weeks
+
+        Return:
+            tuple of the schedule, the datetime it was retrieved and whether it is still fresh, or None if there is no cached schedule
+        """
+
+        assert isinstance(n_weeks, int)
+
+        if self.cache is None:
+            return None
+        suff = 'rooster/per_week?limit=' + str(n_weeks)
+        cached = self.cache.get(suff, allow_stale=True)
+        if cached is None:
+            return None
+        fresh = datetime.now() - cached[1] <= timedelta(seconds=self.cache.ttl(suff))
+        return (cached[0]['items'], cached[1], fresh)
 
     def registered_courses(self, limit:int):
         """
@@ -186,7 +667,11 @@ class sisAPI:
 
         assert isinstance(limit, int)
 
-        return list(self._getData('inschrijvingen/cursussen').json()['items']) + list(self._getData('inschrijvingen/wachtlijsten_cursus').json()['items']) + list(self._getData('inschrijvingen/voorinschrijvingen_cursus').json()['items'])
+        responses = self.fetch_all([suff + '?limit=' + str(limit) for suff in ['inschrijvingen/cursussen', 'inschrijvingen/wachtlijsten_cursus', 'inschrijvingen/voorinschrijvingen_cursus']])
+        courses = []
+        for response in responses:
+            courses += list(response['items'])
+        return courses
 
     def registered_exams(self, limit:int):
         """
@@ -201,19 +686,25 @@ class sisAPI:
 
         assert isinstance(limit, int)
 
-        return list(self._getData('inschrijvingen/toetsen?limit=' + str(limit)).json()['items'])
+        return list(self._getJSON('inschrijvingen/toetsen?limit=' + str(limit))['items'])
 
-    def search_for_course(self, query:str):
+    def search_for_course(self, query:str, year:int = None, start:int = 0, size:int = 25, fields = sisquery.SOURCE_FIELDS, aggregations = (), cached:bool = True):
         """
         Returns list of results after searching for query
 
         Args:
-            query: str, query to search for
+            query: str, query to search for, or None to list all courses
+            year: (optional) int, academic year, defaults to the current one
+            start: (optional) int, index of the first result, for paging
+            size: (optional) int, number of results
+            fields: (optional) list of str, fields to return per result, or None for all fields
+            aggregations: (optional) list of str, fields to aggregate on, see sisquery.AGGREGATIONS
+            cached: (optional) bool, use the response cache
 
         Return:
             list of results
         """
-        return self._getData('cursussen_voor_cursusinschrijving/zoeken', 'POST', '{"from":0,"size":25,"sort":[{"cursus_korte_naam.raw":{"order":"asc"}},{"cursus":{"order":"asc"}},{"collegejaar":{"order":"desc"}},{"blok":{"order":"asc"}}],"aggs":{"agg_terms_inschrijfperiodes_cursus.datum_vanaf":{"filter":{"bool":{"must":[{"range":{"inschrijfperiodes_cursus.datum_vanaf":{"lte":"now"}}},{"range":{"inschrijfperiodes_cursus.datum_tm":{"gte":"now"}}},{"terms":{"collegejaar":[2020]}}]}},"aggs":{"models":{"terms":{"field":"inschrijfperiodes_cursus.datum_vanaf","size":500,"order":{"_term":"asc"}}}}},"agg_terms_programma":{"filter":{"bool":{"must":[{"terms":{"id_cursus_blok":[147435,147607]}},{"terms":{"collegejaar":[2020]}}]}},"aggs":{"models":{"terms":{"field":"id_cursus_blok","size":500,"order":{"_term":"asc"}}}}},"agg_terms_collegejaar":{"filter":{"bool":{"must":[]}},"aggs":{"models":{"terms":{"field":"collegejaar","size":500,"order":{"_term":"desc"}}}}},"agg_terms_periode_omschrijving":{"filter":{"bool":{"must":[{"terms":{"collegejaar":[2020]}}]}},"aggs":{"models":{"terms":{"field":"periode_omschrijving","size":500,"order":{"_term":"asc"},"exclude":"Period: [0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]"}}}},"agg_terms_aanvangsmaand":{"filter":{"bool":{"must":[{"terms":{"collegejaar":[2020]}}]}},"aggs":{"models":{"terms":{"field":"aanvangsmaand","size":500,"order":{"_term":"asc"}}}}},"agg_terms_faculteit_naam":{"filter":{"bool":{"must":[{"terms":{"collegejaar":[2020]}}]}},"aggs":{"models":{"terms":{"field":"faculteit_naam","size":500,"order":{"_term":"asc"}}}}},"agg_terms_cursustype_omschrijving":{"filter":{"bool":{"must":[{"terms":{"collegejaar":[2020]}}]}},"aggs":{"models":{"terms":{"field":"cursustype_omschrijving","size":500,"order":{"_term":"asc"}}}}},"agg_terms_voertalen.voertaal_omschrijving":{"filter":{"bool":{"must":[{"terms":{"collegejaar":[2020]}}]}},"aggs":{"models":{"terms":{"field":"voertalen.voertaal_omschrijving","size":500,"order":{"_term":"asc"}}}}},"agg_terms_bijvakker":{"filter":{"bool":{"must":[{"terms":{"collegejaar":[2020]}}]}},"aggs":{"models":{"terms":{"field":"bijvakker","size":500,"order":{"_term":"asc"}}}}},"agg_terms_docenten.docent":{"filter":{"bool":{"must":[{"terms":{"collegejaar":[2020]}}]}},"aggs":{"models":{"terms":{"field":"docenten.docent","size":500,"order":{"_term":"asc"}}}}}},"post_filter":{"terms":{"collegejaar":[2020]}},"query":{"bool":{"should":[{"match_phrase_prefix":{"cursus":"' + query + '"}},{"match_phrase_prefix":{"cursus_korte_naam":"' + query + '"}}],"minimum_should_match":1}}}').json()
+        return self._getJSON('cursussen_voor_cursusinschrijving/zoeken', 'POST', sisquery.search_body(query, year, start, size, fields, aggregations), cached=cached)
 
     def get_course_info(self, course_id:str):
         """
@@ -223,9 +714,23 @@ class sisAPI:
             course_id: str, id_cursus_blok
 
         Return:
-            information about course
+            information about course, or raises NotFoundError if it does not exist
         """
-        return self._getData('cursussen_voor_cursusinschrijving/' + str(course_id)).json()
+        # error responses must raise, so the memo does not remember them
+        return self.memo.get(('course', str(course_id)), lambda: self._getJSON('cursussen_voor_cursusinschrijving/' + str(course_id), checked=True))
+
+    def get_course_infos(self, course_ids):
+        """
+        Obtains information about several courses, looking them up in parallel
+
+        Args:
+            course_ids: list of str, id_cursus_blok, may contain duplicates
+
+        Return:
+            dict from course id to information about the course
+        """
+        course_ids = list(dict.fromkeys(str(course_id) for course_id in course_ids))
+        return dict(zip(course_ids, self._map_concurrent(self.get_course_info, course_ids)))
 
     def get_tests_for_course(self, course_id:str):
         """
@@ -235,9 +740,61 @@ class sisAPI:
             test_id: str, id_cursus
 
         Return:
-            information about test
+            information about test, or raises NotFoundError if the course does not exist
+        """
+        return self.memo.get(('tests', str(course_id)), lambda: self._getJSON('cursussen_voor_toetsinschrijving/' + str(course_id), checked=True))
+
+    def get_tests_for_courses(self, course_ids):
+        """
+        Obtains information about the tests of several courses, looking them up in parallel
+
+        Args:
+            course_ids: list of str, id_cursus, may contain duplicates
+
+        Return:
+            dict from course id to information about its tests
+        """
+        course_ids = list(dict.fromkeys(str(course_id) for course_id in course_ids))
+        return dict(zip(course_ids, self._map_concurrent(self.get_tests_for_course, course_ids)))
+
+    def prepare_test_registration(self, test_info):
+        """
+        Builds the request that registers for a test, without sending it
+
+        Args:
+            test_info: information about the test
+
+        Return:
+            (method, URL suffix, payload) tuple, to be passed to send
+        """
+        return ('POST', 'inschrijvingen/toetsen/', _test_payload(test_info))
+
+    def prepare_course_registration(self, course_info):
+        """
+        Builds the request that enrols in a course, without sending it
+
+        Args:
+            course_info: information about the course, as returned by get_course_info
+
+        Return:
+            (method, URL suffix, payload) tuple, to be passed to send
+        """
+        return ('PUT', 'inschrijvingen/cursussen/' + str(course_info['id_cursus_blok']), _course_payload(course_info))
+
+    def send(self, prepared):
+        """
+        Sends a request built by one of the prepare methods
+
+        Args:
+            prepared: (method, URL suffix, payload) tuple
+
+        Return:
+            request response
         """
-        return self._getData('cursussen_voor_toetsinschrijving/' + str(course_id)).json()
+        method, suff, payload = prepared
+        ret = self._getData(suff, method, payload)
+        self._invalidateRegistrations()
+        return ret
 
     def register_for_test(self, test_info):
         """
@@ -249,7 +806,7 @@ class sisAPI:
         Return:
 
         """
-        return self._getData('inschrijvingen/toetsen/', 'POST', '{"toetsen": [' + json.dumps(test_info) + ']}')
+        return self.send(self.prepare_test_registration(test_info))
 
     def register_for_course(self, course_info):
         """
@@ -260,17 +817,4 @@ class sisAPI:
         Return:
 
         """
-        course_info['toets_voorzieningen'] = []
-        course_info['toetsen'] = []
-        course_info['werkvorm_groepen'] = []
-        course_info['werkvormen'] = []
-        # maybe something to do with dyselxia?
-        course_info['werkvorm_voorzieningen'] = []
-        course_info['blokken'] = []
-        course_info['kosten'] = []
-        course_info['inschrijfperiodes'] = []
-        course_info['enrollment_type'] = 'regular'
-        course_info['onderdeel_van'] = ''
-        course_info['is_in_enrolment_period'] = False
-        course_info['groepen'] = []
-        return self._getData('inschrijvingen/cursussen/' + str(course_info['id_cursus_blok']), 'PUT', json.dumps(course_info))
+        return self.send(self.prepare_course_registration(course_info))
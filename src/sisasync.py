@@ -0,0 +1,208 @@
+import asyncio
+import httpx
+import sisquery
+from sisAPI import NoTokenError, SignInError, endpoints, _token_path, _read_token_file, _write_token_file, _form_field, _token_info, _login_payload, _test_payload, _course_payload
+
+class AsyncSisAPI:
+    """
+    asyncio version of sisAPI, with the same methods and exceptions.
+
+    All requests go through one httpx.AsyncClient, whose connection pool can be shared
+    between instances by passing the same client to each of them.
+    """
+
+    def __init__(self, client:httpx.AsyncClient = None, access_token:str = None, pool_size:int = 10, connect_timeout:float = 5, read_timeout:float = 30, base_url:str = None):
+        """
+        Args:
+            client: (optional) httpx.AsyncClient, client (and connection pool) to share with other instances
+            access_token: (optional) str, token to use instead of the one stored at ~/.osiris_token
+            pool_size: (optional) int, number of connections kept open, if no client is passed
+            connect_timeout: (optional) float, seconds to wait for a connection, if no client is passed
+            read_timeout: (optional) float, seconds to wait for a response, if no client is passed
+            base_url: (optional) str, scheme and host to send all requests to instead of Osiris, defaults to $OSIRIS_BASE_URL
+        """
+        self.urls = endpoints(base_url)
+        self._owns_client = client is None
+        if client is None:
+            client = httpx.AsyncClient(limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size), timeout=httpx.Timeout(read_timeout, connect=connect_timeout))
+        self.client = client
+        self.access_token = access_token
+        if access_token is None:
+            self._readToken()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        Close the client, unless it was passed in (and is thus shared)
+        """
+        if self._owns_client:
+            await self.client.aclose()
+
+    def _readToken(self):
+        """
+        Try to find previously stored token at ~/.osiris_token
+        """
+        token_info = _read_token_file(_token_path())
+        self.access_token = None if token_info is None else token_info['access_token']
+
+    def _assureSuccess(self, ret):
+        """
+        Thrown an error if the request was unsuccesful
+        """
+        if ret.status_code != 200:
+            raise SignInError()
+
+    async def _getToken(self, username:str, password:str):
+        """
+        Obtain new token using passed credentials
+
+        Args:
+            username: str, s-number (including s)
+            password: str, corresponding password
+
+        Return:
+            dict with the authentication token, the time it was issued and its lifetime in seconds, or throws an error if something went wrong.
+        """
+        # the sign in flow needs its own cookie jar
+        async with httpx.AsyncClient(follow_redirects=True, timeout=self.client.timeout) as ses:
+            r = await ses.get(self.urls['authorize_start'])
+            self._assureSuccess(r)
+
+            r2 = await ses.post(self.urls['idp_login'], params=_login_payload(username, password, str(r.url)))
+            self._assureSuccess(r2)
+
+            ret = await ses.post(self.urls['sp_assertion'], data={'SAMLResponse': _form_field(r2.text, 'SAMLResponse')})
+            self._assureSuccess(ret)
+
+            ret = await ses.post(self.urls['authorize'], data={'SAMLResponse': _form_field(ret.text, 'SAMLResponse'), 'RelayState': _form_field(ret.text, 'RelayState')})
+            self._assureSuccess(ret)
+
+            return _token_info(str(ret.url))
+
+    async def _getData(self, suff:str, method:str = 'GET', payload:str = ""):
+        """
+        Helper method for executing requests
+
+        Args:
+            suff: str, request URL suffix
+            method: GET, POST or PUT, specifies request method
+            payload: (optional) str, request payload
+
+        Return:
+            request response
+        """
+
+        assert(method == 'POST' or method == 'GET' or method == 'PUT')
+        assert isinstance(suff, str)
+        assert isinstance(payload, str)
+
+        if self.access_token is None:
+            raise NoTokenError()
+        ret = await self.client.request(method, self.urls['api'] + suff, headers={'Authorization': 'Bearer ' + self.access_token, 'taal': 'EN'}, content=payload)
+        if ret.status_code == 401:
+            # the token expired or was revoked, signing in again is needed
+            raise NoTokenError()
+        return ret
+
+    async def fetch_all(self, suffixes):
+        """
+        Executes GET requests for several URL suffixes concurrently
+
+        Args:
+            suffixes: list of str, request URL suffixes
+
+        Return:
+            list of decoded JSON responses, in the same order as suffixes
+        """
+        responses = await asyncio.gather(*[self._getData(suff) for suff in suffixes])
+        return [response.json() for response in responses]
+
+    async def sign_in(self, username:str, password:str):
+        """
+        Sign in using credentials and store new token
+
+        Args:
+            username: str, s-number (including s)
+            password: str, corresponding password
+
+        Return:
+            Login success status
+        """
+
+        assert isinstance(username, str)
+        assert isinstance(password, str)
+
+        try:
+            token_info = await self._getToken(username, password)
+            _write_token_file(_token_path(), token_info)
+            self.access_token = token_info['access_token']
+            return True
+        except:
+            return False
+
+    async def grades(self, limit:int):
+        """
+        Returns list of grades, see sisAPI.grades
+        """
+        assert isinstance(limit, int)
+        return (await self._getData('resultaten?limit=' + str(limit))).json()['items']
+
+    async def schedule(self, n_weeks:int):
+        """
+        Returns list representing schedule, see sisAPI.schedule
+        """
+        assert isinstance(n_weeks, int)
+        return (await self._getData('rooster/per_week?limit=' + str(n_weeks))).json()['items']
+
+    async def registered_courses(self, limit:int):
+        """
+        Returns list of courses registered for, see sisAPI.registered_courses
+        """
+        assert isinstance(limit, int)
+        responses = await self.fetch_all([suff + '?limit=' + str(limit) for suff in ['inschrijvingen/cursussen', 'inschrijvingen/wachtlijsten_cursus', 'inschrijvingen/voorinschrijvingen_cursus']])
+        courses = []
+        for response in responses:
+            courses += list(response['items'])
+        return courses
+
+    async def registered_exams(self, limit:int):
+        """
+        Returns list of exams registered for, see sisAPI.registered_exams
+        """
+        assert isinstance(limit, int)
+        return list((await self._getData('inschrijvingen/toetsen?limit=' + str(limit))).json()['items'])
+
+    async def search_for_course(self, query:str, year:int = None, start:int = 0, size:int = 25, fields = sisquery.SOURCE_FIELDS, aggregations = ()):
+        """
+        Returns list of results after searching for query, see sisAPI.search_for_course
+        """
+        return (await self._getData('cursussen_voor_cursusinschrijving/zoeken', 'POST', sisquery.search_body(query, year, start, size, fields, aggregations))).json()
+
+    async def get_course_info(self, course_id:str):
+        """
+        Obtains information about course, see sisAPI.get_course_info
+        """
+        return (await self._getData('cursussen_voor_cursusinschrijving/' + str(course_id))).json()
+
+    async def get_tests_for_course(self, course_id:str):
+        """
+        Obtains information about test, see sisAPI.get_tests_for_course
+        """
+        return (await self._getData('cursussen_voor_toetsinschrijving/' + str(course_id))).json()
+
+    async def register_for_test(self, test_info):
+        """
+        Registers for test, see sisAPI.register_for_test
+        """
+        return await self._getData('inschrijvingen/toetsen/', 'POST', _test_payload(test_info))
+
+    async def register_for_course(self, course_info):
+        """
+        Enrols in course, see sisAPI.register_for_course
+        """
+        return await self._getData('inschrijvingen/cursussen/' + str(course_info['id_cursus_blok']), 'PUT', _course_payload(course_info))
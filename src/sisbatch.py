@@ -0,0 +1,124 @@
+import json
+from siserrors import NotFoundError
+from concurrent.futures import ThreadPoolExecutor
+
+class PlanError(Exception):
+    """
+    Raised when a registration plan can not be read
+    """
+
+def load_plan(filename:str):
+    """
+    Reads a registration plan from a JSON or YAML file, of the form
+
+        courses:
+          - 123456          # id_cursus_blok
+        exams:
+          - 98765           # id_cursus, registers for its first test
+          - id_cursus: 98766
+            test_idx: 1     # as listed by newexam
+
+    Return:
+        list of plan items, dicts with a kind ('course' or 'exam'), an id and for exams a test_idx
+    """
+    try:
+        with open(filename, 'r') as f:
+            if filename.endswith('.json'):
+                plan = json.load(f)
+            else:
+                import yaml
+                try:
+                    plan = yaml.safe_load(f)
+                except yaml.YAMLError as inst:
+                    raise PlanError(str(inst))
+    except ImportError:
+        raise PlanError('PyYAML is needed to read YAML plans, use JSON or install pyyaml')
+    except ValueError as inst:
+        raise PlanError(str(inst))
+
+    if not isinstance(plan, dict):
+        raise PlanError('a plan should contain courses and/or exams')
+    for kind in ('courses', 'exams'):
+        if not isinstance(plan.get(kind) or [], list):
+            raise PlanError('{} should be a list'.format(kind))
+
+    items = []
+    for course in plan.get('courses') or []:
+        items.append({'kind': 'course', 'id': _plan_id(course)})
+    for exam in plan.get('exams') or []:
+        if isinstance(exam, dict):
+            if 'id_cursus' not in exam:
+                raise PlanError('exam without id_cursus: {}'.format(exam))
+            test_idx = exam.get('test_idx', 0)
+            # bool is a subclass of int, but true is no test index
+            if not isinstance(test_idx, int) or isinstance(test_idx, bool) or test_idx < 0:
+                raise PlanError('test_idx of exam {} should be a non-negative integer'.format(exam['id_cursus']))
+            items.append({'kind': 'exam', 'id': _plan_id(exam['id_cursus']), 'test_idx': test_idx})
+        else:
+            items.append({'kind': 'exam', 'id': _plan_id(exam), 'test_idx': 0})
+
+    # registering twice for the same course or test would send the same request twice at once
+    unique = {}
+    for item in items:
+        unique.setdefault((item['kind'], item['id'], item.get('test_idx')), item)
+    return list(unique.values())
+
+def _plan_id(value):
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or str(value).strip() == '':
+        raise PlanError('invalid course id in plan: {!r}'.format(value))
+    return str(value).strip()
+
+def _resolve_item(api, item):
+    item = dict(item)
+    try:
+        if item['kind'] == 'course':
+            item['info'] = api.get_course_info(item['id'])
+            item['prepared'] = api.prepare_course_registration(dict(item['info']))
+        else:
+            tests = api.get_tests_for_course(item['id'])
+            item['info'] = dict(tests['toetsen'][item['test_idx']], collegejaar=tests['collegejaar'], cursus=tests['cursus'], cursus_korte_naam=tests['cursus_korte_naam'])
+            item['prepared'] = api.prepare_test_registration(tests['toetsen'][item['test_idx']])
+    except (NotFoundError, KeyError, IndexError, TypeError, ValueError):
+        item['error'] = 'not found'
+    except OSError as inst:
+        item['error'] = type(inst).__name__
+    return item
+
+def resolve(api, items, max_workers:int = 4):
+    """
+    Looks up the course or test of every plan item concurrently and prepares its registration
+
+    Args:
+        api: sisAPI, api to look up and prepare with
+        items: list of plan items, as returned by load_plan
+        max_workers: (optional) int, maximum number of requests in flight
+
+    Return:
+        list of items, with the looked up info and prepared request, or an error
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda item: _resolve_item(api, item), items))
+
+def _submit_item(api, item):
+    item = dict(item)
+    try:
+        item['status'] = api.send(item['prepared']).status_code
+    except OSError as inst:
+        item['status'] = type(inst).__name__
+    return item
+
+def submit(api, items, max_workers:int = 4):
+    """
+    Sends the prepared registrations of all resolved items concurrently
+
+    Args:
+        api: sisAPI, api to send with
+        items: list of items, as returned by resolve
+        max_workers: (optional) int, maximum number of requests in flight
+
+    Return:
+        list of the items that were sent, with their response status
+    """
+    items = [item for item in items if 'error' not in item]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda item: _submit_item(api, item), items))
@@ -0,0 +1,149 @@
+import os
+import json
+import hashlib
+import tempfile
+from datetime import datetime
+import sishooks
+
+# time to live in seconds, by endpoint prefix (longest matching prefix wins)
+DEFAULT_TTLS = {
+    '': 5 * 60,
+    'resultaten': 15 * 60,
+    'rooster/per_week': 60 * 60,
+    'inschrijvingen/': 10 * 60,
+    'cursussen_voor_cursusinschrijving/': 24 * 60 * 60,
+    'cursussen_voor_toetsinschrijving/': 60 * 60,
+    'cursussen_voor_cursusinschrijving/zoeken': 24 * 60 * 60,
+}
+
+class ResponseCache:
+    """
+    On-disk cache for decoded API responses, keyed by endpoint and request parameters.
+
+    Every entry is stored in its own file. Entries expire after a per-endpoint time to
+    live, and the least recently used entries are evicted once the cache exceeds its
+    size bound. Writes go to a temporary file that is then renamed, so readers never
+    see a partially written entry.
+    """
+
+    def __init__(self, directory:str = None, ttls:dict = None, max_entries:int = 500, max_bytes:int = 50 * 1024 * 1024):
+        """
+        Args:
+            directory: (optional) str, directory to store entries in, defaults to ~/.osiris_cache
+            ttls: (optional) dict, time to live in seconds by endpoint prefix, merged with DEFAULT_TTLS
+            max_entries: (optional) int, maximum number of entries kept
+            max_bytes: (optional) int, maximum total size of all entries
+        """
+        if directory is None:
+            directory = os.environ['HOME'] + '/.osiris_cache'
+        self.directory = directory
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, suff:str, payload:str = ''):
+        key = hashlib.sha1((suff + '\n' + payload).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + '.json')
+
+    def ttl(self, suff:str):
+        """
+        Returns the time to live of entries for endpoint suff
+        """
+        prefix = max((prefix for prefix in self.ttls if suff.startswith(prefix)), key=len)
+        return self.ttls[prefix]
+
+    def get(self, suff:str, payload:str = '', allow_stale:bool = False):
+        """
+        Look up a cached response
+
+        Args:
+            suff: str, request URL suffix
+            payload: (optional) str, request payload
+            allow_stale: (optional) bool, also return entries whose time to live has passed
+
+        Return:
+            tuple of the cached response and the datetime it was stored, or None if there is no (fresh) entry
+        """
+        path = self._path(suff, payload)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            sishooks.emit('cache', suff=suff, hit=False)
+            return None
+
+        time_written = entry['time_written']
+        if not allow_stale and datetime.now().timestamp() - time_written > self.ttl(suff):
+            sishooks.emit('cache', suff=suff, hit=False)
+            return None
+        sishooks.emit('cache', suff=suff, hit=True)
+
+        # mark as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return (entry['data'], datetime.fromtimestamp(time_written))
+
+    def put(self, suff:str, data, payload:str = ''):
+        """
+        Store a response
+
+        Args:
+            suff: str, request URL suffix
+            data: decoded response
+            payload: (optional) str, request payload
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'endpoint': suff, 'time_written': datetime.now().timestamp(), 'data': data}, f)
+            os.replace(tmp_path, self._path(suff, payload))
+        except:
+            os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        """
+        Remove least recently used entries until the cache is within its bounds
+        """
+        entries = sorted(self._entries())
+        total_bytes = sum(entry[1] for entry in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, prefix:str = ''):
+        """
+        Remove all entries of endpoints starting with prefix, or all entries if no prefix is passed
+        """
+        for _, _, path in self._entries():
+            try:
+                if prefix != '':
+                    with open(path, 'r') as f:
+                        if not json.load(f)['endpoint'].startswith(prefix):
+                            continue
+                os.remove(path)
+            except (FileNotFoundError, ValueError):
+                pass
@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import bisect
+import difflib
+import tempfile
+from datetime import datetime
+import sisquery
+
+# fields kept per course, those shown by the search command plus the indexed ones
+FIELDS = sisquery.SOURCE_FIELDS + ['faculteit_naam', 'docenten', 'voertalen']
+
+_TOKEN = re.compile(r'[^\W_]+')
+
+def _tokens(text):
+    return _TOKEN.findall(str(text).lower())
+
+def _indexed_text(course):
+    """
+    Returns the texts a course can be found by: code, short name, faculty, teachers and languages
+    """
+    texts = [course.get('cursus'), course.get('cursus_korte_naam'), course.get('faculteit_naam')]
+    texts += [teacher.get('docent') for teacher in course.get('docenten') or []]
+    texts += [language.get('voertaal_omschrijving') for language in course.get('voertalen') or []]
+    return [text for text in texts if text]
+
+class Catalog:
+    """
+    Local copy of the course catalog of one academic year, with an inverted index for searching it offline
+    """
+
+    def __init__(self, path:str = None):
+        """
+        Args:
+            path: (optional) str, catalog file, defaults to ~/.osiris_catalog.json
+        """
+        if path is None:
+            path = os.environ['HOME'] + '/.osiris_catalog.json'
+        self.path = path
+        self.year = None
+        self.time_synced = None
+        self.courses = []
+        self.index = {}
+        self.tokens = []
+
+    def load(self):
+        """
+        Read the catalog from disk
+
+        Return:
+            whether a catalog was found
+        """
+        try:
+            with open(self.path, 'r') as f:
+                catalog = json.load(f)
+        except FileNotFoundError:
+            return False
+        self.year = catalog['year']
+        self.time_synced = datetime.fromtimestamp(catalog['time_synced'])
+        self.courses = catalog['courses']
+        self.index = catalog['index']
+        self.tokens = sorted(self.index)
+        return True
+
+    def sync(self, api, year:int = None, page_size:int = 500):
+        """
+        Download the catalog of an academic year, rebuild the index and store both
+
+        Args:
+            api: sisAPI, api to download the catalog with
+            year: (optional) int, academic year, defaults to the current one
+            page_size: (optional) int, number of courses per request
+
+        Return:
+            number of courses in the catalog
+        """
+        if year is None:
+            year = sisquery.academic_year()
+
+        courses = []
+        start = 0
+        while True:
+            # bypass the response cache: a sync should see the current catalog, and its pages would evict useful entries
+            hits = api.search_for_course(None, year, start, page_size, FIELDS, (), False)['hits']['hits']
+            courses += [hit['_source'] for hit in hits]
+            if len(hits) < page_size:
+                break
+            start += page_size
+
+        index = {}
+        for idx, course in enumerate(courses):
+            for text in _indexed_text(course):
+                for token in _tokens(text):
+                    postings = index.setdefault(token, [])
+                    if not postings or postings[-1] != idx:
+                        postings.append(idx)
+
+        self.year = year
+        self.time_synced = datetime.now()
+        self.courses = courses
+        self.index = index
+        self.tokens = sorted(index)
+        self._write()
+        return len(courses)
+
+    def _write(self):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'year': self.year, 'time_synced': self.time_synced.timestamp(), 'courses': self.courses, 'index': self.index}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def _matches(self, token:str, fuzzy:bool):
+        """
+        Returns the indices of the courses containing a word that starts with token,
+        or, if there are none and fuzzy is set, a word that closely resembles token
+        """
+        matches = set()
+        idx = bisect.bisect_left(self.tokens, token)
+        while idx < len(self.tokens) and self.tokens[idx].startswith(token):
+            matches.update(self.index[self.tokens[idx]])
+            idx += 1
+        if not matches and fuzzy:
+            for close in difflib.get_close_matches(token, self.tokens, n=5, cutoff=0.75):
+                matches.update(self.index[close])
+        return matches
+
+    def search(self, query:str, size:int = 25, fuzzy:bool = True):
+        """
+        Searches the catalog for courses matching every word of query
+
+        Args:
+            query: str, words to search for, matched as prefixes
+            size: (optional) int, maximum number of results
+            fuzzy: (optional) bool, also match words with small typos
+
+        Return:
+            dict with the total number of matches and the hits, shaped like the 'hits' of search_for_course
+        """
+        matches = None
+        for token in _tokens(query):
+            token_matches = self._matches(token, fuzzy)
+            matches = token_matches if matches is None else matches & token_matches
+        if matches is None:
+            matches = set()
+
+        results = sorted((self.courses[idx] for idx in matches), key=lambda course: (str(course.get('cursus_korte_naam')), str(course.get('cursus'))))
+        return {'total': len(results), 'hits': [{'_source': course} for course in results[:size]]}
@@ -0,0 +1,202 @@
+import os
+import json
+import socket
+import socketserver
+from siserrors import NoTokenError, SignInError, NotFoundError
+
+# read-only methods that may be answered by the daemon; grades and registrations are read from
+# the local store, which is synced through sync_table instead
+FORWARDED = ('schedule', 'search_for_course', 'get_course_info', 'get_tests_for_course', 'get_course_infos', 'get_tests_for_courses')
+
+# calls answered by the daemon itself rather than by its api
+DAEMON_CALLS = ('sync_table',)
+
+ERRORS = {'NoTokenError': NoTokenError, 'SignInError': SignInError, 'NotFoundError': NotFoundError}
+
+# seconds to wait for the daemon to accept a call, and to answer it
+CONNECT_TIMEOUT = 1
+REPLY_TIMEOUT = 60
+
+def socket_path():
+    return os.environ['HOME'] + '/.osiris_sock'
+
+class DaemonError(Exception):
+    """
+    Raised when the daemon failed to execute a forwarded call
+    """
+
+class DaemonUnreachable(OSError):
+    """
+    Raised when the daemon does not answer a call, or answers it with garbage
+    """
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    Answers a single JSON encoded call per connection
+    """
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            call = json.loads(line)
+            if call['method'] not in FORWARDED and call['method'] not in DAEMON_CALLS:
+                raise DaemonError('method ' + str(call['method']) + ' is not forwarded')
+            self.server.reload_token()
+            target = self.server if call['method'] in DAEMON_CALLS else self.server.api
+            response = {'result': getattr(target, call['method'])(*call['args'])}
+        except Exception as inst:
+            # network errors (requests' included) are OSErrors, and are raised as such by the proxy
+            response = {'error': type(inst).__name__, 'message': str(inst), 'oserror': isinstance(inst, OSError)}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server that keeps one authenticated sisAPI (and its connections and caches) warm
+    """
+
+    daemon_threads = True
+
+    def __init__(self, api, path:str = None):
+        """
+        Args:
+            api: sisAPI, api to answer calls with
+            path: (optional) str, socket path, defaults to ~/.osiris_sock
+        """
+        if path is None:
+            path = socket_path()
+        if os.path.exists(path):
+            os.remove(path)
+        self.api = api
+        self.path = path
+        self.token_mtime = self._token_mtime()
+
+        # only the owner may connect
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(old_umask)
+
+    def _token_mtime(self):
+        try:
+            return os.path.getmtime(os.environ['HOME'] + '/.osiris_token')
+        except FileNotFoundError:
+            return None
+
+    def reload_token(self):
+        """
+        Pick up a token stored by signing in after the daemon was started
+        """
+        mtime = self._token_mtime()
+        if mtime != self.token_mtime:
+            self.token_mtime = mtime
+            self.api._readToken()
+
+    def sync_table(self, table:str, full:bool = False):
+        """
+        Brings a table of the local store up to date, over the connections of the daemon
+        """
+        import sisstore
+        store = sisstore.Store()
+        try:
+            return store.sync_table(self.api, table, full)
+        finally:
+            store.close()
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class DaemonProxy:
+    """
+    Stands in for a sisAPI, forwarding read-only calls to a running daemon.
+
+    Calls that are not forwarded, or that cannot reach the daemon, are executed by the local sisAPI.
+    The daemon always uses its cache, so the proxy should not be used when the cache is bypassed.
+    """
+
+    def __init__(self, local, path:str = None):
+        """
+        Args:
+            local: sisAPI, api used for everything that is not forwarded
+            path: (optional) str, socket path, defaults to ~/.osiris_sock
+        """
+        object.__setattr__(self, 'local', local)
+        object.__setattr__(self, 'path', socket_path() if path is None else path)
+
+    def _call(self, method:str, args):
+        """
+        Executes method on the daemon
+
+        Return:
+            result of the call, or raises the exception raised by the daemon; raises DaemonUnreachable
+            if the daemon does not answer
+        """
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(CONNECT_TIMEOUT)
+                sock.connect(self.path)
+                sock.settimeout(REPLY_TIMEOUT)
+                sock.sendall(json.dumps({'method': method, 'args': list(args)}).encode('utf-8') + b'\n')
+                line = sock.makefile('rb').readline()
+        except OSError as inst:
+            raise DaemonUnreachable(str(inst))
+        try:
+            # a daemon that is shutting down closes the connection without answering
+            response = json.loads(line)
+            if 'error' not in response and 'result' not in response:
+                raise ValueError('no result')
+        except (ValueError, TypeError) as inst:
+            raise DaemonUnreachable('invalid reply from daemon: ' + str(inst))
+
+        if 'error' in response:
+            if response['error'] in ERRORS:
+                raise ERRORS[response['error']](response['message'])
+            if response.get('oserror'):
+                raise OSError(response['message'])
+            raise DaemonError(response['message'])
+        return response['result']
+
+    def sync_table(self, table:str, full:bool = False):
+        """
+        Brings a table of the local store up to date through the daemon, or locally if it is not running
+
+        Return:
+            dict with the number of new, changed and removed records
+        """
+        try:
+            return self._call('sync_table', [table, full])
+        except DaemonUnreachable:
+            import sisstore
+            store = sisstore.Store()
+            try:
+                return store.sync_table(self.local, table, full)
+            finally:
+                store.close()
+
+    def __getattr__(self, name):
+        if name not in FORWARDED:
+            return getattr(self.local, name)
+        # only resolved when falling back, so the local api need not be constructed
+        attr = lambda *args: getattr(self.local, name)(*args)
+
+        def forward(*args):
+            try:
+                return self._call(name, args)
+            except DaemonUnreachable:
+                return attr(*args)
+        return forward
+
+    def __setattr__(self, name, value):
+        setattr(self.local, name, value)
+
+def connect(local, path:str = None):
+    """
+    Returns a DaemonProxy if a daemon socket exists, or local otherwise
+    """
+    if os.path.exists(socket_path() if path is None else path):
+        return DaemonProxy(local, path)
+    return local
@@ -0,0 +1,14 @@
+class NoTokenError(Exception):
+    """
+    Raised when a token is needed but no token is defined
+    """
+
+class SignInError(Exception):
+    """
+    Raised when something went wrong during signing in. Presumed to be caused by incorrect credentials
+    """
+
+class NotFoundError(Exception):
+    """
+    Raised when the requested course or test does not exist
+    """
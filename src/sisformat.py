@@ -0,0 +1,64 @@
+import sys
+import csv
+import itertools
+import json
+
+# output formats of the listing commands; table is the styled, human readable one
+FORMATS = ['table', 'json', 'jsonl', 'csv', 'tsv']
+
+def parse_fields(fields:str, default):
+    """
+    Returns the list of fields selected by a comma separated --fields value, or default if it is not given
+    """
+    if fields is None:
+        return list(default)
+    return [field.strip() for field in fields.split(',') if field.strip() != '']
+
+def _cell(value):
+    # nested values can not be represented in a single cell otherwise
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return '' if value is None else value
+
+def write_records(records, fields, fmt:str, out = None):
+    """
+    Writes records as they come, without styling, padding or paging
+
+    Args:
+        records: iterable of dicts, as returned by the API; the first one is read before anything
+            is written, so an error fetching it does not leave a partial document behind
+        fields: list of str, keys of the records to write, in order
+        fmt: str, one of json, jsonl, csv or tsv
+        out: (optional) file to write to, defaults to stdout
+
+    Return:
+        number of records written
+    """
+    assert fmt in FORMATS and fmt != 'table'
+    if out is None:
+        out = sys.stdout
+
+    records = iter(records)
+    first = next(records, None)
+    if first is not None:
+        records = itertools.chain([first], records)
+
+    count = 0
+    if fmt in ('csv', 'tsv'):
+        writer = csv.writer(out, delimiter=',' if fmt == 'csv' else '\t', lineterminator='\n')
+        writer.writerow(fields)
+        for record in records:
+            writer.writerow([_cell(record.get(field)) for field in fields])
+            count += 1
+    elif fmt == 'jsonl':
+        for record in records:
+            out.write(json.dumps({field: record.get(field) for field in fields}) + '\n')
+            count += 1
+    else:
+        # a JSON array, written element by element
+        out.write('[')
+        for record in records:
+            out.write((',\n' if count > 0 else '\n') + json.dumps({field: record.get(field) for field in fields}))
+            count += 1
+        out.write('\n]\n' if count > 0 else ']\n')
+    return count
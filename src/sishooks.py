@@ -0,0 +1,126 @@
+import json
+import time
+import threading
+
+# events that can be hooked, and the fields they are emitted with:
+#   pre_send: phase ('request' or 'auth'), method, url
+#   response: phase, method, url, status, seconds, server_seconds, sent, received
+#   decode: suff, seconds
+#   cache: suff, hit
+#   render: what, rows, seconds
+EVENTS = ('pre_send', 'response', 'decode', 'cache', 'render')
+
+_hooks = {event: [] for event in EVENTS}
+
+def register(event:str, hook):
+    """
+    Call hook(event, fields) whenever event is emitted
+
+    Args:
+        event: str, one of EVENTS
+        hook: callable taking the event name and a dict of its fields
+    """
+    assert event in _hooks
+    _hooks[event].append(hook)
+
+def unregister(event:str, hook):
+    _hooks[event].remove(hook)
+
+def emit(event:str, **fields):
+    """
+    Pass an event to its hooks; hooks may be called from several threads at once
+    """
+    for hook in _hooks[event]:
+        hook(event, fields)
+
+def active(event:str):
+    """
+    Returns whether any hook is registered for event, to skip measuring when nobody listens
+    """
+    return len(_hooks[event]) > 0
+
+class Profiler:
+    """
+    Hook that sums up where the time of a command went
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.requests = 0
+        self.sent = 0
+        self.received = 0
+        self.cache = {True: 0, False: 0}
+        self.lock = threading.Lock()
+
+    def install(self):
+        for event in EVENTS:
+            register(event, self)
+        return self
+
+    def uninstall(self):
+        for event in EVENTS:
+            unregister(event, self)
+
+    def _add(self, phase:str, seconds:float):
+        count, total = self.phases.get(phase, (0, 0.0))
+        self.phases[phase] = (count + 1, total + seconds)
+
+    def __call__(self, event:str, fields:dict):
+        with self.lock:
+            if event == 'response':
+                self.requests += 1
+                self.sent += fields['sent']
+                self.received += fields['received']
+                # elapsed until the response headers arrived, the rest is spent reading the body and retrying
+                self._add(fields['phase'] + ' (until headers)', fields['server_seconds'])
+                self._add(fields['phase'] + ' (body, retries)', max(0.0, fields['seconds'] - fields['server_seconds']))
+            elif event == 'decode':
+                self._add('decode', fields['seconds'])
+            elif event == 'cache':
+                self.cache[fields['hit']] += 1
+            elif event == 'render':
+                self._add('render ' + fields['what'], fields['seconds'])
+
+    def report(self, connections:dict = None):
+        """
+        Returns the breakdown as text
+
+        Args:
+            connections: (optional) dict, connection counters as returned by sisAPI.connection_stats
+        """
+        lines = ['{:<28} {:>6} {:>10}'.format('phase', 'count', 'seconds')]
+        for phase in sorted(self.phases):
+            count, total = self.phases[phase]
+            lines.append('{:<28} {:>6} {:>10.4f}'.format(phase, count, total))
+        lines.append('{:<28} {:>6} {:>10.4f}'.format('total', '', time.perf_counter() - self.started))
+        lines.append('requests: {}, sent: {} B, received: {} B'.format(self.requests, self.sent, self.received))
+        lines.append('cache hits: {}, misses: {}'.format(self.cache[True], self.cache[False]))
+        if connections is not None:
+            lines.append('connections opened: {}, reused: {}'.format(connections['opened'], connections['reused']))
+        return '\n'.join(lines)
+
+class JSONLinesExporter:
+    """
+    Hook that appends every event as one JSON object per line to a file
+    """
+
+    def __init__(self, path:str):
+        self.file = open(path, 'a')
+        self.lock = threading.Lock()
+
+    def install(self):
+        for event in EVENTS:
+            register(event, self)
+        return self
+
+    def __call__(self, event:str, fields:dict):
+        line = json.dumps(dict(fields, event=event, time=time.time()))
+        with self.lock:
+            self.file.write(line + '\n')
+
+    def close(self):
+        for event in EVENTS:
+            if self in _hooks[event]:
+                unregister(event, self)
+        self.file.close()
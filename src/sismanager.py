@@ -0,0 +1,181 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from requests.cookies import RequestsCookieJar, create_cookie
+from sisAPI import sisAPI
+from sistransport import Transport, TokenBucket, CircuitBreaker, pool_stats
+
+class FileTokenStore:
+    """
+    Stores the tokens and single sign on cookies of each account as files in a directory
+    """
+
+    def __init__(self, directory:str):
+        self.directory = directory
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, account:str, kind:str):
+        # account names end up in file names; asserts are skipped under python -O, so check explicitly
+        if not (account.isascii() and account.isalnum()):
+            raise ValueError('invalid account name: {!r}'.format(account))
+        return os.path.join(self.directory, account + '.' + kind)
+
+    def load(self, account:str, kind:str):
+        """
+        Return:
+            the stored data of kind ('token' or 'cookies') for account, or None if there is none
+        """
+        try:
+            with open(self._path(account, kind), 'r') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def save(self, account:str, kind:str, data:str):
+        path = self._path(account, kind)
+        fd = os.open(path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+class SQLiteTokenStore:
+    """
+    Stores the tokens and single sign on cookies of each account in an SQLite database
+    """
+
+    def __init__(self, path:str):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.execute('CREATE TABLE IF NOT EXISTS tokens (account TEXT, kind TEXT, data TEXT, PRIMARY KEY (account, kind))')
+            self.db.commit()
+
+    def load(self, account:str, kind:str):
+        """
+        Return:
+            the stored data of kind ('token' or 'cookies') for account, or None if there is none
+        """
+        with self.lock:
+            row = self.db.execute('SELECT data FROM tokens WHERE account = ? AND kind = ?', (account, kind)).fetchone()
+        return None if row is None else row[0]
+
+    def save(self, account:str, kind:str, data:str):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO tokens VALUES (?, ?, ?)', (account, kind, data))
+            self.db.commit()
+
+class AccountAPI(sisAPI):
+    """
+    sisAPI for one account of a ClientManager, keeping its token and cookies in the manager's store
+    """
+
+    def __init__(self, account:str, store, transport:Transport, memo_ttl:float = 300):
+        self.account = account
+        self.store = store
+        super().__init__(use_cache=False, memo_ttl=memo_ttl, transport=transport)
+
+    def _readToken(self):
+        data = self.store.load(self.account, 'token')
+        if data is None:
+            return None
+        self._setToken(json.loads(data))
+        return self.access_token
+
+    def _storeToken(self):
+        self.store.save(self.account, 'token', json.dumps(self.token_info))
+
+    def _saveCookies(self, cookies):
+        self.store.save(self.account, 'cookies', json.dumps([{'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain, 'path': cookie.path, 'expires': cookie.expires, 'secure': cookie.secure} for cookie in cookies]))
+
+    def _loadCookies(self):
+        jar = RequestsCookieJar()
+        data = self.store.load(self.account, 'cookies')
+        if data is not None:
+            for cookie in json.loads(data):
+                jar.set_cookie(create_cookie(**cookie))
+        return jar
+
+class ClientManager:
+    """
+    Serves many accounts from one process.
+
+    All accounts share one bounded connection pool. At most max_clients accounts are kept
+    in memory, the least recently used ones are dropped (their tokens stay in the store),
+    and every account has at most per_account_concurrency requests in flight. The rate
+    limit and the circuit breaker apply to all accounts together, as they protect the server.
+
+        manager = ClientManager(FileTokenStore('/var/lib/sis/tokens'))
+        manager.sign_in('s1234567', password)
+        manager.for_user('s1234567').grades(100)
+    """
+
+    def __init__(self, store, max_clients:int = 1000, pool_size:int = 50, per_account_concurrency:int = 4, connect_timeout:float = 5, read_timeout:float = 30, memo_ttl:float = 300, rate:float = 50):
+        """
+        Args:
+            store: FileTokenStore or SQLiteTokenStore, where tokens and cookies are kept
+            max_clients: (optional) int, maximum number of accounts kept in memory
+            pool_size: (optional) int, maximum number of connections per host, shared by all accounts
+            per_account_concurrency: (optional) int, maximum number of requests in flight per account
+            connect_timeout: (optional) float, seconds to wait for a connection
+            read_timeout: (optional) float, seconds to wait for a response
+            memo_ttl: (optional) float, seconds course and test information is remembered per account
+            rate: (optional) float, maximum number of requests per second of all accounts together
+        """
+        self.store = store
+        self.max_clients = max_clients
+        self.per_account_concurrency = per_account_concurrency
+        self.pool_size = pool_size
+        self.timeouts = (connect_timeout, read_timeout)
+        self.memo_ttl = memo_ttl
+        # block instead of opening connections beyond the pool size
+        self.adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        self.limiter = TokenBucket(rate, max_rate=rate)
+        self.breaker = CircuitBreaker()
+        self.clients = OrderedDict()
+        self.lock = threading.Lock()
+
+    def for_user(self, snumber:str):
+        """
+        Returns the api of an account, creating it from the stored token if it is not in memory
+
+        Args:
+            snumber: str, s-number of the account
+
+        Return:
+            sisAPI for the account
+        """
+        with self.lock:
+            client = self.clients.get(snumber)
+            if client is not None:
+                self.clients.move_to_end(snumber)
+                return client
+
+        transport = Transport(self.pool_size, self.timeouts[0], self.timeouts[1], adapter=self.adapter, max_concurrent=self.per_account_concurrency, limiter=self.limiter, breaker=self.breaker)
+        client = AccountAPI(snumber, self.store, transport, self.memo_ttl)
+
+        with self.lock:
+            # another thread may have created it in the meantime
+            client = self.clients.setdefault(snumber, client)
+            self.clients.move_to_end(snumber)
+            while len(self.clients) > self.max_clients:
+                # the session is not closed, as that would close the shared pool
+                self.clients.popitem(last=False)
+        return client
+
+    def sign_in(self, snumber:str, password:str):
+        """
+        Sign an account in and store its token
+
+        Return:
+            Login success status
+        """
+        return self.for_user(snumber).sign_in(snumber, password)
+
+    def connection_stats(self):
+        """
+        Returns connection reuse counters of the shared pool
+        """
+        return pool_stats(self.adapter)
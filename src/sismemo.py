@@ -0,0 +1,78 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+class Memo:
+    """
+    In-process memo with a time to live and least recently used eviction.
+
+    Concurrent lookups of the same key are coalesced: the first caller computes the
+    value, the others wait for its result. Failures are passed to all waiting callers
+    but are not remembered. Values are shared, so callers should not modify them.
+    """
+
+    def __init__(self, ttl:float = 300, max_entries:int = 1000):
+        """
+        Args:
+            ttl: (optional) float, seconds a value is remembered
+            max_entries: (optional) int, maximum number of values remembered
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        """
+        Returns the remembered value for key, computing it if there is none
+
+        Args:
+            key: hashable key
+            compute: callable without arguments that computes the value
+
+        Return:
+            value for key
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self.entries.move_to_end(key)
+                return entry[1]
+
+            future = self.pending.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.pending[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as inst:
+            with self.lock:
+                del self.pending[key]
+            future.set_exception(inst)
+            raise
+
+        with self.lock:
+            del self.pending[key]
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key = None):
+        """
+        Forget the value for key, or all values if no key is passed
+        """
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
@@ -0,0 +1,77 @@
+import json
+from datetime import date
+
+# fields shown by the search command
+SOURCE_FIELDS = ['id_cursus_blok', 'id_cursus', 'collegejaar', 'blok', 'cursus', 'cursus_korte_naam', 'punten', 'inschrijfperiodes']
+
+# parts of the request body that never change, serialized once
+_SORT = json.dumps([{'cursus_korte_naam.raw': {'order': 'asc'}}, {'cursus': {'order': 'asc'}}, {'collegejaar': {'order': 'desc'}}, {'blok': {'order': 'asc'}}], separators=(',', ':'))
+_TEMPLATE = '{"from":%d,"size":%d,%s"sort":' + _SORT + ',%s"query":{"bool":{"filter":[{"terms":{"collegejaar":[%d]}}]%s}}}'
+_MATCH_TEMPLATE = ',"should":[{"match_phrase_prefix":{"cursus":%s}},{"match_phrase_prefix":{"cursus_korte_naam":%s}}],"minimum_should_match":1'
+
+# aggregations that can be requested, by field
+AGGREGATIONS = {
+    'inschrijfperiodes_cursus.datum_vanaf': {'order': 'asc', 'open_now': True},
+    'collegejaar': {'order': 'desc', 'all_years': True},
+    'periode_omschrijving': {'order': 'asc', 'exclude': 'Period: [0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]'},
+    'aanvangsmaand': {'order': 'asc'},
+    'faculteit_naam': {'order': 'asc'},
+    'cursustype_omschrijving': {'order': 'asc'},
+    'voertalen.voertaal_omschrijving': {'order': 'asc'},
+    'bijvakker': {'order': 'asc'},
+    'docenten.docent': {'order': 'asc'},
+}
+
+def academic_year(day:date = None):
+    """
+    Returns the academic year (collegejaar) day falls in, which starts in September
+    """
+    if day is None:
+        day = date.today()
+    return day.year if day.month >= 9 else day.year - 1
+
+def _aggregation(field:str, year:int, size:int):
+    options = AGGREGATIONS[field]
+    must = []
+    if options.get('open_now'):
+        must += [{'range': {'inschrijfperiodes_cursus.datum_vanaf': {'lte': 'now'}}}, {'range': {'inschrijfperiodes_cursus.datum_tm': {'gte': 'now'}}}]
+    if not options.get('all_years'):
+        must.append({'terms': {'collegejaar': [year]}})
+    terms = {'field': field, 'size': size, 'order': {'_term': options['order']}}
+    if 'exclude' in options:
+        terms['exclude'] = options['exclude']
+    return {'filter': {'bool': {'must': must}}, 'aggs': {'models': {'terms': terms}}}
+
+def search_body(query:str = None, year:int = None, start:int = 0, size:int = 25, fields = SOURCE_FIELDS, aggregations = (), aggregation_size:int = 500):
+    """
+    Builds the request body for cursussen_voor_cursusinschrijving/zoeken
+
+    Args:
+        query: (optional) str, prefix of the course code or name, or None to match all courses
+        year: (optional) int, academic year, defaults to the current one
+        start: (optional) int, index of the first hit to return
+        size: (optional) int, number of hits to return
+        fields: (optional) list of str, fields to return per hit, or None for all fields
+        aggregations: (optional) list of str, fields from AGGREGATIONS to aggregate on
+        aggregation_size: (optional) int, maximum number of buckets per aggregation
+
+    Return:
+        JSON encoded request body
+    """
+    if year is None:
+        year = academic_year()
+
+    source = ''
+    if fields is not None:
+        source = '"_source":' + json.dumps(list(fields), separators=(',', ':')) + ','
+
+    aggs = ''
+    if aggregations:
+        aggs = '"aggs":' + json.dumps({'agg_terms_' + field: _aggregation(field, year, aggregation_size) for field in aggregations}, separators=(',', ':')) + ','
+
+    match = ''
+    if query is not None:
+        quoted = json.dumps(query)
+        match = _MATCH_TEMPLATE % (quoted, quoted)
+
+    return _TEMPLATE % (int(start), int(size), source, aggs, int(year), match)
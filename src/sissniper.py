@@ -0,0 +1,141 @@
+import math
+import time
+from email.utils import parsedate_to_datetime
+
+# request used to measure the server clock and to keep the connection alive
+PROBE = 'resultaten?limit=1'
+
+class ClockError(Exception):
+    """
+    Raised when the clock of the server can not be measured
+    """
+
+class Sniper:
+    """
+    Sends a prepared registration request at an exact moment in server time.
+
+    The request is built in advance, the pooled connection is kept warm while waiting,
+    and the local clock is corrected using the Date headers of the server.
+    """
+
+    def __init__(self, api, retries:int = 5, backoff:float = 0.05, max_backoff:float = 0.4, keepalive_interval:float = 15):
+        """
+        Args:
+            api: sisAPI, api to send the requests with
+            retries: (optional) int, number of retries after a failed attempt
+            backoff: (optional) float, seconds to wait before the first retry, doubled for every next one
+            max_backoff: (optional) float, maximum number of seconds to wait between retries
+            keepalive_interval: (optional) float, seconds between requests that keep the connection alive while waiting
+        """
+        self.api = api
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.keepalive_interval = keepalive_interval
+        self.offset = 0.0
+        # the server clock is offset plus or minus this many seconds ahead
+        self.uncertainty = math.inf
+
+    def _probe(self):
+        """
+        Sends the probe request
+
+        Return:
+            (second of the Date header of the server, local send time, local receive time)
+        """
+        sent = time.time()
+        ret = self.api._getData(PROBE)
+        received = time.time()
+        if ret.headers.get('Date') is None:
+            raise ClockError('the server sends no Date header, so its clock can not be measured')
+        return (parsedate_to_datetime(ret.headers['Date']).timestamp(), sent, received)
+
+    def sync_clock(self, samples:int = 8, precision:float = 0.005):
+        """
+        Estimates the offset of the server clock, which also opens the connection.
+
+        Date is truncated to whole seconds, so a single probe only bounds the offset to a
+        second. Every next probe is timed to reach the server just when, by the current
+        estimate, its Date changes to the next second; whether it does or not halves the
+        interval the offset lies in, down to about the round trip time.
+
+        Args:
+            samples: (optional) int, maximum number of probe requests
+            precision: (optional) float, width in seconds of the interval at which to stop probing
+
+        Return:
+            seconds the server clock is ahead of the local clock
+        """
+        low, high = -math.inf, math.inf
+        round_trip = math.inf
+        for sample in range(samples):
+            if sample > 0:
+                estimate = (low + high) / 2
+                # local time at which the server second changes, by the estimate; leave time to get there
+                boundary = math.floor(time.time() + round_trip + estimate) + 1 - estimate
+                time.sleep(max(0.0, boundary - round_trip / 2 - time.time()))
+            second, sent, received = self._probe()
+            round_trip = min(round_trip, received - sent)
+
+            # the server wrote Date somewhere between sending and receiving
+            probe_low, probe_high = second - received, second + 1 - sent
+            if probe_low > high or probe_high < low:
+                # the server clock jumped, start over from this probe
+                low, high = probe_low, probe_high
+            else:
+                low, high = max(low, probe_low), min(high, probe_high)
+            if high - low <= precision:
+                break
+
+        self.offset = (low + high) / 2
+        self.uncertainty = (high - low) / 2
+        return self.offset
+
+    def _wait_until(self, target:float):
+        """
+        Waits until local time target, keeping the connection alive, and spinning for the last few milliseconds
+        """
+        last_probe = time.time()
+        while True:
+            remaining = target - time.time()
+            if remaining <= 0.005:
+                break
+            if remaining > 2 and time.time() - last_probe > self.keepalive_interval:
+                self._probe()
+                last_probe = time.time()
+            time.sleep(min(remaining - 0.005, 1))
+        while time.time() < target:
+            pass
+
+    def fire(self, prepared, at:float):
+        """
+        Sends prepared at server time at, retrying failed attempts with a short exponential backoff
+
+        Args:
+            prepared: (method, URL suffix, payload) tuple, as returned by sisAPI.prepare_course_registration or prepare_test_registration
+            at: float, POSIX timestamp in server time
+
+        Return:
+            tuple of the last response (or None if every attempt failed to connect) and a list of
+            attempts, each a dict with the send time relative to at, the latency and the status
+        """
+        self._wait_until(at - self.offset)
+
+        attempts = []
+        ret = None
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+            sent = time.time()
+            try:
+                ret = self.api.send(prepared)
+                status = ret.status_code
+            except OSError as inst:
+                status = type(inst).__name__
+            received = time.time()
+            attempts.append({'sent': sent + self.offset - at, 'latency': received - sent, 'status': status})
+            if status == 200:
+                break
+        return (ret, attempts)
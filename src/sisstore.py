@@ -0,0 +1,177 @@
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+
+# how the items of each table are fetched and identified
+TABLES = {
+    'results': {
+        'endpoints': ['resultaten'],
+        'key': ('cursus', 'collegejaar', 'blok', 'toets', 'gelegenheid'),
+        'incremental': True,
+        'order': 'collegejaar DESC, blok DESC, cursus',
+    },
+    'course_registrations': {
+        'endpoints': ['inschrijvingen/cursussen', 'inschrijvingen/wachtlijsten_cursus', 'inschrijvingen/voorinschrijvingen_cursus'],
+        'key': ('id_cursus', 'collegejaar', 'blok'),
+        # registrations can be withdrawn, which is only noticed by a full sync
+        'incremental': False,
+        'order': 'collegejaar, blok, id_cursus',
+    },
+    'exam_registrations': {
+        'endpoints': ['inschrijvingen/toetsen'],
+        'key': ('id_toets_gelegenheid',),
+        'incremental': True,
+        'order': 'toetsdatum',
+    },
+}
+
+def default_path():
+    return os.environ['HOME'] + '/.osiris.db'
+
+class Store:
+    """
+    Local SQLite copy of the results, course registrations and exam registrations of a student.
+
+    sync() brings the store up to date. For incremental tables it pages through the list
+    endpoints newest first and stops at the first page without new or changed records.
+    """
+
+    def __init__(self, path:str = None):
+        """
+        Args:
+            path: (optional) str, database file, defaults to ~/.osiris.db
+        """
+        if path is None:
+            path = default_path()
+        # the store holds grades and registrations, keep it private; sqlite would create it world readable
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        os.fchmod(fd, 0o600)
+        os.close(fd)
+        self.db = sqlite3.connect(path)
+        for table in TABLES:
+            self.db.execute('CREATE TABLE IF NOT EXISTS ' + table + ' (key TEXT PRIMARY KEY, endpoint TEXT, hash TEXT, cursus TEXT, id_cursus TEXT, collegejaar INTEGER, blok TEXT, toetsdatum TEXT, data TEXT)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS ' + table + '_course ON ' + table + ' (collegejaar, blok, cursus)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS sync (tbl TEXT PRIMARY KEY, time_synced REAL)')
+        self.db.commit()
+
+    def _record(self, table:str, endpoint:str, item):
+        """
+        Returns the key of item, its serialized data and the digest of that data
+        """
+        key = endpoint + '|' + json.dumps([item.get(field) for field in TABLES[table]['key']])
+        data = json.dumps(item, sort_keys=True)
+        return (key, data, hashlib.sha1(data.encode('utf-8')).hexdigest())
+
+    def _fetch(self, api, table:str, endpoint:str, known:dict, full:bool, page_size:int):
+        """
+        Fetches the records of one endpoint; runs in a worker thread, so it does not touch the database
+
+        Args:
+            known: dict, digest of every stored record of endpoint by key
+
+        Return:
+            list of records
+        """
+        items = []
+        # prefetching would mostly fetch pages that are known already
+        for page in api.iter_pages(endpoint, page_size, prefetch=False):
+            items.extend(page)
+            # everything after a page of known records is known as well
+            if not full and page and all(known.get(key) == digest for key, data, digest in (self._record(table, endpoint, item) for item in page)):
+                break
+        return items
+
+    def _sync(self, api, tables, full:bool, page_size:int):
+        jobs = []
+        for table in tables:
+            for endpoint in TABLES[table]['endpoints']:
+                known = dict(self.db.execute('SELECT key, hash FROM ' + table + ' WHERE endpoint = ?', (endpoint,)).fetchall())
+                jobs.append((table, endpoint, known, full or not TABLES[table]['incremental']))
+        fetched = api._map_concurrent(lambda job: self._fetch(api, job[0], job[1], job[2], job[3], page_size), jobs)
+
+        results = {table: {'new': 0, 'changed': 0, 'removed': 0} for table in tables}
+        for (table, endpoint, known, table_full), items in zip(jobs, fetched):
+            counts = results[table]
+            seen = set()
+            for item in items:
+                key, data, digest = self._record(table, endpoint, item)
+                seen.add(key)
+                if known.get(key) == digest:
+                    continue
+                self.db.execute('INSERT OR REPLACE INTO ' + table + ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (key, endpoint, digest, item.get('cursus'), item.get('id_cursus'), item.get('collegejaar'), item.get('blok'), item.get('toetsdatum'), data))
+                counts['new' if key not in known else 'changed'] += 1
+                known[key] = digest
+
+            if table_full:
+                for key in known:
+                    if key not in seen:
+                        self.db.execute('DELETE FROM ' + table + ' WHERE key = ?', (key,))
+                        counts['removed'] += 1
+
+        for table in tables:
+            self.db.execute('INSERT OR REPLACE INTO sync VALUES (?, ?)', (table, datetime.now().timestamp()))
+        self.db.commit()
+        return results
+
+    def sync_table(self, api, table:str, full:bool = False, page_size:int = 50):
+        """
+        Brings one table up to date, fetching its endpoints concurrently
+
+        Args:
+            api: sisAPI, api to fetch the records with
+            table: str, name of the table
+            full: (optional) bool, fetch all pages and remove records that no longer exist
+            page_size: (optional) int, number of records per request
+
+        Return:
+            dict with the number of new, changed and removed records
+        """
+        return self._sync(api, [table], full, page_size)[table]
+
+    def sync(self, api, full:bool = False, page_size:int = 50):
+        """
+        Brings all tables up to date, fetching all endpoints concurrently
+
+        Return:
+            dict from table name to the counts returned by sync_table
+        """
+        return self._sync(api, list(TABLES), full, page_size)
+
+    def last_synced(self, table:str):
+        """
+        Returns the datetime table was last synced, or None if it never was
+        """
+        row = self.db.execute('SELECT time_synced FROM sync WHERE tbl = ?', (table,)).fetchone()
+        return None if row is None else datetime.fromtimestamp(row[0])
+
+    def records(self, table:str, where:str = '', params = ()):
+        """
+        Iterates over the stored records of table
+
+        Args:
+            table: str, name of the table
+            where: (optional) str, SQL condition on the indexed columns
+            params: (optional) parameters of the condition
+
+        Return:
+            generator of records, as returned by the API
+        """
+        query = 'SELECT data FROM ' + table
+        if where != '':
+            query += ' WHERE ' + where
+        for (data,) in self.db.execute(query + ' ORDER BY ' + TABLES[table]['order'], params):
+            yield json.loads(data)
+
+    def clear(self):
+        """
+        Removes all records and sync times, e.g. because another student signed in
+        """
+        for table in TABLES:
+            self.db.execute('DELETE FROM ' + table)
+        self.db.execute('DELETE FROM sync')
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,358 @@
+import re
+import time
+import collections
+import random
+import threading
+import requests
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+
+# responses worth retrying: throttling and temporary server failures
+RETRY_STATUS = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# seconds after throttling during which further 429 responses do not lower the rate again
+THROTTLE_HOLDOFF = 1
+# seconds in which the rate doubles while probing for the limit of the server
+PROBE_DOUBLING = 0.1
+# factor by which the rate grows per second after the server throttled
+RECOVERY = 1.25
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of sending a request while the server is considered down
+    """
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    The rate adapts to the server. Until the server first throttles, the rate doubles every
+    PROBE_DOUBLING seconds that requests are held back by it. When the server throttles, the
+    rate drops to the rate the server accepted over the last second, or to half, whichever
+    is lower. After that it grows by a factor RECOVERY per second, probing for a higher limit.
+    """
+
+    def __init__(self, rate:float, burst:int = None, min_rate:float = 0.5, max_rate:float = None):
+        """
+        Args:
+            rate: float, number of requests per second to start at
+            burst: (optional) int, number of requests that may be sent at once, defaults to rate
+            min_rate: (optional) float, rate below which throttling does not push the limit
+            max_rate: (optional) float, rate the limit never exceeds, or None to find it by probing
+        """
+        self.max_rate = max_rate
+        self.rate = rate if max_rate is None else min(rate, max_rate)
+        self.min_rate = min(min_rate, self.rate)
+        self.burst = max(1, int(rate) if burst is None else burst)
+        # when the server last throttled, None while it never did
+        self.last_throttled = None
+        # times of the successes of the last second
+        self.accepted = collections.deque()
+        self.held_back = False
+        self.grown = time.monotonic()
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Wait until a request may be sent
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.held_back = True
+            time.sleep(wait)
+
+    def _forget(self, now:float):
+        while self.accepted and now - self.accepted[0] > 1:
+            self.accepted.popleft()
+
+    def throttled(self):
+        with self.lock:
+            now = time.monotonic()
+            # the requests already sent at the old rate are throttled as well; adapt once for all of them
+            if self.last_throttled is not None and now - self.last_throttled < THROTTLE_HOLDOFF:
+                return
+            self.last_throttled = now
+            self._forget(now)
+            rate = self.rate / 2 if not self.accepted else min(self.rate / 2, len(self.accepted))
+            self.rate = max(self.min_rate, rate)
+            self.grown = now
+
+    def succeeded(self):
+        with self.lock:
+            now = time.monotonic()
+            self.accepted.append(now)
+            self._forget(now)
+            elapsed = min(1.0, now - self.grown)
+            self.grown = now
+            if not self.held_back:
+                # the limit is not what keeps requests back, raising it tells nothing
+                return
+            self.held_back = False
+            if self.last_throttled is None:
+                self.rate *= 2 ** (elapsed / PROBE_DOUBLING)
+            else:
+                self.rate *= RECOVERY ** elapsed
+            if self.max_rate is not None:
+                self.rate = min(self.max_rate, self.rate)
+
+class CircuitBreaker:
+    """
+    Stops sending requests for a while after several consecutive failures.
+
+    Once reset_timeout has passed, a single trial request is let through: if it
+    succeeds the circuit closes again, if it fails the circuit stays open. Every request
+    that passes before() must be settled with succeeded(), failed() or abandoned().
+    """
+
+    def __init__(self, failure_threshold:int = 5, reset_timeout:float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def before(self):
+        """
+        Raises CircuitOpenError if no request may be sent now
+        """
+        with self.lock:
+            if self.opened is None:
+                return
+            if self.trial or time.monotonic() - self.opened < self.reset_timeout:
+                raise CircuitOpenError('too many failed requests, retrying in at most ' + str(self.reset_timeout) + ' seconds')
+            self.trial = True
+
+    def succeeded(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.trial = False
+
+    def failed(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.failure_threshold:
+                self.opened = time.monotonic()
+            self.trial = False
+
+    def abandoned(self):
+        """
+        Settles a request that ended without telling anything about the server
+        """
+        with self.lock:
+            self.trial = False
+
+def _retry_after(ret):
+    """
+    Returns the number of seconds the Retry-After header of ret asks to wait, or None
+    """
+    value = ret.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _endpoint(url:str):
+    """
+    Returns the endpoint of url used for per-endpoint rate limiting: its path, without IDs
+    """
+    return re.sub(r'/\d+(?=/|$)', '/*', urlsplit(url).path)
+
+def pool_stats(adapter:HTTPAdapter):
+    """
+    Connection counters of an adapter, summed over all host pools it currently holds
+
+    Return:
+        dict with the number of requests sent, connections opened and connections reused
+    """
+    requests_sent = 0
+    opened = 0
+    pools = adapter.poolmanager.pools
+    for key in pools.keys():
+        pool = pools[key]
+        requests_sent += pool.num_requests
+        opened += pool.num_connections
+    return {'requests': requests_sent, 'opened': opened, 'reused': requests_sent - opened}
+
+class Transport:
+    """
+    Pooled, keep-alive HTTP transport shared by all requests of one sisAPI instance.
+
+    A single requests.Session is kept for the lifetime of the transport, so TCP and TLS
+    connections to the API host are reused instead of being opened for every request.
+    Requests are rate limited, globally and per endpoint, idempotent requests are retried
+    with jittered exponential backoff, and a circuit breaker stops sending requests while
+    the server keeps failing.
+    """
+
+    def __init__(self, pool_size:int = 10, connect_timeout:float = 5, read_timeout:float = 30, headers:dict = None, adapter:HTTPAdapter = None, max_concurrent:int = None, rate:float = 20, max_rate:float = None, endpoint_rate:float = None, retries:int = 3, backoff:float = 0.2, max_backoff:float = 10, limiter:TokenBucket = None, breaker:CircuitBreaker = None):
+        """
+        Args:
+            pool_size: int, maximum number of keep-alive connections per host
+            connect_timeout: float, seconds to wait for a connection to be established
+            read_timeout: float, seconds to wait for the server to send a response
+            headers: (optional) dict, default headers sent with every request
+            adapter: (optional) HTTPAdapter, connection pool to share with other transports, instead of a new one of pool_size
+            max_concurrent: (optional) int, maximum number of requests this transport has in flight
+            rate: (optional) float, number of requests per second to start at, or None for no limit; the limit rises
+                while the server keeps up and is halved when it throttles
+            max_rate: (optional) float, maximum number of requests per second, or None to go as high as the server allows
+            endpoint_rate: (optional) float, maximum number of requests per second to any single endpoint, or None for no limit
+            retries: (optional) int, number of retries of failed idempotent requests
+            backoff: (optional) float, base of the exponential backoff between retries, in seconds
+            max_backoff: (optional) float, maximum number of seconds to wait before a retry
+            limiter: (optional) TokenBucket, global rate limiter to share with other transports, instead of one of rate
+            breaker: (optional) CircuitBreaker, circuit breaker to share with other transports
+        """
+        self.pool_size = pool_size if max_concurrent is None else min(pool_size, max_concurrent)
+        self.timeout = (connect_timeout, read_timeout)
+        if adapter is None:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.adapter = adapter
+        self.semaphore = None if max_concurrent is None else threading.BoundedSemaphore(max_concurrent)
+
+        if limiter is None and rate is not None:
+            limiter = TokenBucket(rate, max_rate=max_rate)
+        self.limiter = limiter
+        self.endpoint_rate = endpoint_rate
+        self.endpoint_limiters = {}
+        self.breaker = CircuitBreaker() if breaker is None else breaker
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        if headers is not None:
+            self.session.headers.update(headers)
+
+    def set_header(self, name:str, value:str):
+        """
+        Set (or remove, if value is None) a default header
+        """
+        if value is None:
+            self.session.headers.pop(name, None)
+        else:
+            self.session.headers[name] = value
+
+    def _acquire(self, url:str):
+        """
+        Wait until the rate limiters allow a request to url
+        """
+        if self.limiter is not None:
+            self.limiter.acquire()
+        if self.endpoint_rate is not None:
+            endpoint = _endpoint(url)
+            with self.lock:
+                limiter = self.endpoint_limiters.get(endpoint)
+                if limiter is None:
+                    limiter = self.endpoint_limiters[endpoint] = TokenBucket(self.endpoint_rate, max_rate=self.endpoint_rate)
+            limiter.acquire()
+
+    def _send(self, method:str, url:str, **kwargs):
+        self._acquire(url)
+        if self.semaphore is None:
+            ret = self.session.request(method, url, **kwargs)
+        else:
+            with self.semaphore:
+                ret = self.session.request(method, url, **kwargs)
+
+        if self.limiter is not None:
+            if ret.status_code == 429:
+                self.limiter.throttled()
+            elif ret.status_code < 500:
+                self.limiter.succeeded()
+        return ret
+
+    def _attempt(self, method:str, url:str, retries:int, **kwargs):
+        """
+        Sends a request, retrying it up to retries times if it fails temporarily
+        """
+        for attempt in range(retries + 1):
+            try:
+                ret = self._send(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == retries:
+                    raise
+                ret = None
+
+            if ret is not None and (ret.status_code not in RETRY_STATUS or attempt == retries):
+                return ret
+
+            # full jitter, unless the server says how long to wait
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            if ret is not None:
+                retry_after = _retry_after(ret)
+                if retry_after is not None:
+                    if retry_after > self.max_backoff:
+                        # retrying earlier than asked would only be refused again
+                        return ret
+                    delay = retry_after
+            time.sleep(delay)
+
+    def request(self, method:str, url:str, **kwargs):
+        """
+        Send a request over the pooled session, retrying it if it is idempotent and fails temporarily
+
+        Args:
+            method: str, request method
+            url: str, full request URL
+            kwargs: passed on to requests.Session.request
+
+        Return:
+            request response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        retries = self.retries if method.upper() in IDEMPOTENT_METHODS else 0
+
+        # the circuit breaker counts one outcome per request, however often it was retried
+        self.breaker.before()
+        settled = False
+        try:
+            ret = self._attempt(method, url, retries, **kwargs)
+            if ret.status_code >= 500:
+                self.breaker.failed()
+            else:
+                # a 429 means the server is up, just busy
+                self.breaker.succeeded()
+            settled = True
+            return ret
+        except requests.exceptions.RequestException:
+            self.breaker.failed()
+            settled = True
+            raise
+        finally:
+            if not settled:
+                self.breaker.abandoned()
+
+    def stats(self):
+        """
+        Connection counters, summed over all host pools currently held
+
+        Return:
+            dict with the number of requests sent, connections opened and connections reused
+        """
+        return pool_stats(self.adapter)
+
+    def close(self):
+        self.session.close()
@@ -1,49 +1,207 @@
 import click
-from tabulate import tabulate
-import json
-from datetime import datetime
+import os
+import time
+import shutil
+import sishooks
 
-def style_schedule(sched):
-    DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    LEC_TYPE_COLO = {'LEC': 'green', 'TUT': 'blue', 'DIGI-INZAGE': 'yellow', 'EXA': 'red', 'COMP': 'cyan', 'DLT': 'red', 'PRE': 'green', 'LAB': 'magenta', 'RSP': 'bright_blue'}
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
-    sched_list = []
+LEC_TYPE_COLO = {'LEC': 'green', 'TUT': 'blue', 'DIGI-INZAGE': 'yellow', 'EXA': 'red', 'COMP': 'cyan', 'DLT': 'red', 'PRE': 'green', 'LAB': 'magenta', 'RSP': 'bright_blue'}
+
+def style_codes(**styles):
+    """
+    Returns the escape codes click.style puts before and after text, so they can be looked up once and reused
+    """
+    return tuple(click.style('\0', **styles).split('\0'))
+
+class StreamingTable:
+    """
+    Renders a table like tabulate's fancy_grid, but row by row, with column widths fixed in
+    advance instead of computed from all rows. Longer values are cut off.
+    """
+
+    def __init__(self, widths, headers = None):
+        """
+        Args:
+            widths: list of int, width of every column
+            headers: (optional) list of str, column headers
+        """
+        self.widths = widths
+        self.headers = headers
+
+    def _line(self, left:str, fill:str, middle:str, right:str):
+        return left + middle.join(fill * (width + 2) for width in self.widths) + right
+
+    def row(self, cells, styles = None):
+        """
+        Returns one row
+
+        Args:
+            cells: list of values
+            styles: (optional) list of (start, end) escape codes per cell, as returned by style_codes, or None for unstyled cells
+        """
+        parts = []
+        for i in range(len(self.widths)):
+            text = '' if cells[i] is None else str(cells[i])
+            width = self.widths[i]
+            if len(text) > width:
+                text = text[:width - 1] + '…'
+            padding = ' ' * (width - len(text))
+            if styles is not None and styles[i] is not None:
+                text = styles[i][0] + text + styles[i][1]
+            parts.append(' ' + text + padding + ' ')
+        return '│' + '│'.join(parts) + '│'
+
+    def lines(self, rows):
+        """
+        Renders rows as they come
+
+        Args:
+            rows: iterable of (cells, styles) tuples
+
+        Return:
+            generator of lines, ending in a newline
+        """
+        yield self._line('╒', '═', '╤', '╕') + '\n'
+        if self.headers is not None:
+            yield self.row(self.headers) + '\n'
+            yield self._line('╞', '═', '╪', '╡') + '\n'
+        separator = self._line('├', '─', '┼', '┤') + '\n'
+        first = True
+        for cells, styles in rows:
+            if not first:
+                yield separator
+            first = False
+            yield self.row(cells, styles) + '\n'
+        yield self._line('╘', '═', '╧', '╛') + '\n'
+
+def flexible_width(fixed, minimum:int = 20, maximum:int = 60):
+    """
+    Returns the width left on the terminal for one flexible column, next to columns of widths fixed
+    """
+    columns = shutil.get_terminal_size((100, 24)).columns
+    # borders and padding of all columns, the flexible one included
+    used = sum(fixed) + 3 * (len(fixed) + 1) + 1
+    return max(minimum, min(maximum, columns - used))
+
+def stream_schedule(weeks):
+    """
+    Renders the schedule row by row, without laying out the whole table first
+
+    Args:
+        weeks: iterable of weeks, such as the list returned by sisAPI.schedule
+
+    Return:
+        generator of lines
+    """
+    week_style = style_codes(bg='blue')
+    day_style = style_codes(bg='green')
+    # looked up once per lecture type, not per row
+    lecture_styles = {}
+    fixed = [7, 9, 5, 5, 20]
+    table = StreamingTable([7, 9, flexible_width(fixed), 5, 5, 20])
+
+    counts = {'rows': 0, 'waiting': 0.0}
+
+    def arriving():
+        # the time spent waiting for weeks is not rendering time
+        weeks_iter = iter(weeks)
+        while True:
+            start = time.perf_counter()
+            week = next(weeks_iter, None)
+            counts['waiting'] += time.perf_counter() - start
+            if week is None:
+                return
+            yield week
+
+    def rows():
+        for week in arriving():
+            for day_idx in range(0, 7):
+                day = week['dagen'][day_idx]
+                for subj_idx in range(0, len(day['rooster'])):
+                    subj = day['rooster'][subj_idx]
+
+                    # only fill in a value for week or day if it's the first
+                    week_text = ''
+                    day_text = ''
+                    if subj_idx == 0:
+                        if day_idx == 0:
+                            week_text = 'Week ' + str(week['week'])
+                        day_text = DAYS[day_idx]
+
+                    lecture_type = subj['soort_rooster']
+                    lecture_style = lecture_styles.get(lecture_type)
+                    if lecture_style is None:
+                        lecture_style = lecture_styles[lecture_type] = style_codes(fg=LEC_TYPE_COLO[lecture_type])
+
+                    subj_name = subj['onderwerp'][subj['onderwerp'].find(' ')+1:]
+                    counts['rows'] += 1
+                    yield ([week_text, day_text, subj_name, subj['tijd_vanaf'], subj['tijd_tm'], subj['locatie']], [week_style, day_style, lecture_style, None, None, None])
+
+    seconds = 0.0
+    lines = table.lines(rows())
+    while True:
+        start = time.perf_counter()
+        line = next(lines, None)
+        seconds += time.perf_counter() - start
+        if line is None:
+            break
+        yield line
+    sishooks.emit('render', what='schedule', rows=counts['rows'], seconds=seconds - counts['waiting'])
+
+def schedule_records(sched):
+    """
+    Iterates over the lectures of a schedule, each with the week, day and date it is on
+    """
     for week in sched:
         for day_idx in range(0, 7):
             day = week['dagen'][day_idx]
+            for subj in day['rooster']:
+                yield dict(subj, week=week['week'], dag=DAYS[day_idx], datum=day.get('datum'))
 
-            for subj_idx in range(0, len(day['rooster'])):
-                subj = day['rooster'][subj_idx]
-
-                # only fill in a value for week or day if it's the first
-                week_text = ''
-                day_text = ''
+def schedule_entries(sched):
+    """
+    Flattens a schedule into a list of (week, day, subject, from, to, location) tuples
+    """
+    entries = []
+    for week in sched:
+        for day_idx in range(0, 7):
+            for subj in week['dagen'][day_idx]['rooster']:
+                entries.append(('Week ' + str(week['week']), DAYS[day_idx], subj['onderwerp'][subj['onderwerp'].find(' ')+1:], subj['tijd_vanaf'], subj['tijd_tm'], subj['locatie']))
+    return entries
 
-                if subj_idx == 0:
-                    if day_idx == 0:
-                        week_text = 'Week ' + str(week['week'])
-                    day_text = DAYS[day_idx]
+def diff_schedule(old_sched, new_sched):
+    """
+    Returns one line per entry that was removed from or added to the schedule
+    """
+    old_entries = schedule_entries(old_sched)
+    new_entries = schedule_entries(new_sched)
+    old_set = set(old_entries)
+    new_set = set(new_entries)
 
-                subj_name = subj['onderwerp'][subj['onderwerp'].find(' ')+1:]
-                sched_list.append([click.style(week_text, bg='blue'), click.style(day_text, bg='green'), click.style(subj_name, fg=LEC_TYPE_COLO[subj['soort_rooster']]), subj['tijd_vanaf'], subj['tijd_tm'], subj['locatie']])
-    return tabulate(sched_list, tablefmt='fancy_grid')
+    lines = []
+    for entry in old_entries:
+        if entry not in new_set:
+            lines.append('- ' + ' '.join(map(str, entry)))
+    for entry in new_entries:
+        if entry not in old_set:
+            lines.append('+ ' + ' '.join(map(str, entry)))
+    return lines
 
-def write_schedule(filename, sched):
+def write_notice(filename, lines):
     f = open(filename, 'w')
-    json.dump({'schedule': sched, 'time_written': datetime.now().timestamp()}, f)
+    f.write('\n'.join(lines))
+    f.close()
 
-def read_schedule(filename):
+def pop_notice(filename):
+    """
+    Returns the notice stored at filename and removes it, or None if there is none
+    """
     try:
         f = open(filename, 'r')
-        sched_json = json.load(f)
-        time = datetime.fromtimestamp(sched_json['time_written'])
-        if time.isocalendar()[1] != datetime.now().isocalendar()[1]:
-            #outdated cache
-            print(time.isocalendar()[1])
-            return None
-        else:
-            return (sched_json['schedule'], str(time))
+        notice = f.read()
+        f.close()
+        os.remove(filename)
+        return notice
     except FileNotFoundError:
         return None
-#    except:
-#        return None
@@ -0,0 +1,128 @@
+import json
+import time
+import random
+import hashlib
+import sisutil
+from sisstore import TABLES
+
+# what can be watched: the list endpoint, the fields identifying a record and whether
+# records that disappear are reported (results only drop out of the limit window)
+WATCHED = {
+    'grades': {'suff': 'resultaten?limit=', 'key': TABLES['results']['key'], 'removals': False},
+    'exams': {'suff': 'inschrijvingen/toetsen?limit=', 'key': TABLES['exam_registrations']['key'], 'removals': True},
+    'schedule': {'suff': 'rooster/per_week?limit=', 'key': ('week', 'onderwerp', 'soort_rooster', 'occurrence'), 'removals': True},
+}
+
+def fingerprint(record):
+    """
+    Returns a compact digest of a record, which changes whenever any of its fields does
+    """
+    return hashlib.blake2b(json.dumps(record, sort_keys=True, separators=(',', ':')).encode('utf-8'), digest_size=8).digest()
+
+def _schedule_records(weeks):
+    """
+    Flattens weeks into lectures, numbering lectures of the same subject and type within a week,
+    so a lecture that moves to another day or time keeps its key
+    """
+    occurrences = {}
+    for record in sisutil.schedule_records(weeks):
+        base = (record['week'], record['onderwerp'], record['soort_rooster'])
+        occurrences[base] = occurrences.get(base, 0) + 1
+        record['occurrence'] = occurrences[base]
+        yield record
+
+class Watcher:
+    """
+    Polls grades, exams or the schedule and reports the records that were added, changed or removed.
+
+    Between polls only the validators of the last response and one fingerprint per record are
+    kept. The interval grows while nothing changes and is reset when something does.
+    """
+
+    def __init__(self, api, what:str, limit:int = 100, interval:float = 60, max_interval:float = 900, backoff:float = 1.5):
+        """
+        Args:
+            api: sisAPI, api to poll with
+            what: str, grades, exams or schedule
+            limit: (optional) int, number of records to watch, or of weeks for the schedule
+            interval: (optional) float, seconds between polls after a change
+            max_interval: (optional) float, maximum number of seconds between polls
+            backoff: (optional) float, factor the interval grows with after a poll without changes
+        """
+        assert what in WATCHED
+        self.api = api
+        self.what = what
+        self.suff = WATCHED[what]['suff'] + str(limit)
+        self.key_fields = WATCHED[what]['key']
+        self.removals = WATCHED[what]['removals']
+        self.min_interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = interval
+        self.validators = None
+        self.fingerprints = None
+
+    def _records(self, items):
+        return _schedule_records(items) if self.what == 'schedule' else items
+
+    def poll(self):
+        """
+        Polls once. The first poll only records the current state.
+
+        Return:
+            list of (change, record) tuples, change being added, changed or removed;
+            removed records only contain their key fields
+        """
+        items, self.validators = self.api.poll(self.suff, self.validators)
+        if items is None:
+            return []
+
+        fingerprints = {}
+        changes = []
+        for record in self._records(items):
+            key = tuple(record.get(field) for field in self.key_fields)
+            digest = fingerprint(record)
+            fingerprints[key] = digest
+            if self.fingerprints is not None:
+                known = self.fingerprints.get(key)
+                if known is None:
+                    changes.append(('added', record))
+                elif known != digest:
+                    changes.append(('changed', record))
+
+        if self.fingerprints is not None and self.removals:
+            # weeks that have passed are not removed from the schedule
+            weeks = None if self.what != 'schedule' else set(key[0] for key in fingerprints)
+            for key in self.fingerprints:
+                if key not in fingerprints and (weeks is None or key[0] in weeks):
+                    changes.append(('removed', dict(zip(self.key_fields, key))))
+
+        self.fingerprints = fingerprints
+        return changes
+
+    def run(self, emit, polls:int = None):
+        """
+        Polls until interrupted, passing the changes of every poll that has any to emit
+
+        Args:
+            emit: callable taking a list of changes, as returned by poll
+            polls: (optional) int, stop after this many polls
+        """
+        count = 0
+        while polls is None or count < polls:
+            try:
+                changes = self.poll()
+            except OSError:
+                # the server is unreachable or failing, wait longer
+                changes = []
+            count += 1
+
+            if changes:
+                emit(changes)
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+
+            if polls is None or count < polls:
+                # spread the polls of many students over time
+                time.sleep(self.interval * random.uniform(0.9, 1.1))